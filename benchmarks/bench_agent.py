@@ -0,0 +1,221 @@
+"""Agent-loop benchmarks against the local mock model server.
+
+Runs ``MeliusAgent.run_cycle`` end to end (real transport, parser, tools and
+tracing) against ``mock_server.MockModelServer`` in a throwaway HOME, and
+reports JSON:
+
+- ``steps``: wall time per model round trip, split into model, tool and
+  remaining agent overhead (mock latency 0, so this is all our own code)
+- ``history``: memory growth (tracemalloc) and history size over many cycles
+- ``parser``: streaming tool-call parser throughput
+- ``gateway``: cycles/s and latency through ``ChatDispatcher`` with
+  concurrent chats, with the mock adding ``--latency`` per model call
+
+Usage: python benchmarks/bench_agent.py [--cycles 20] [--chats 8] [--latency 0.05]
+       [--provider openrouter|ollama] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_parser import bench_stream, make_response
+from mock_server import DEFAULT_SCRIPT, MockModelServer
+
+APP_SOURCE = "def handler(event):\n    return 1\n\n\ndef helper():\n    return handler(None)\n"
+
+def make_workspace(root):
+    os.makedirs(os.path.join(root, "pkg"), exist_ok=True)
+    with open(os.path.join(root, "app.py"), 'w') as f:
+        f.write(APP_SOURCE)
+    for i in range(50):
+        with open(os.path.join(root, "pkg", f"mod{i}.py"), 'w') as f:
+            f.write(f"def func{i}(x):\n    return x + {i}\n" * 20)
+    return root
+
+def make_provider(server, provider_name):
+    from melius.models.provider import ModelProvider
+
+    provider = ModelProvider()
+    provider.config.update(
+        active_provider=provider_name,
+        openrouter_keys=["bench-key"],
+        openrouter_url=server.openrouter_url,
+        ollama_host=server.ollama_host,
+        fallback_to_ollama=False,
+    )
+    return provider
+
+def stage_totals():
+    from melius.core.tracing import get_tracer
+
+    totals = {}
+    for (name, _), metrics in list(get_tracer().metrics.items()):
+        count, seconds = totals.get(name, (0, 0.0))
+        totals[name] = (count + metrics.count, seconds + metrics.seconds)
+    return totals
+
+def bench_steps(server, workspace, provider, cycles):
+    from melius.core.agent import MeliusAgent
+
+    agent = MeliusAgent(workspace_dir=workspace, provider=provider)
+    agent.run_cycle("warm up")
+    before = stage_totals()
+    walls = []
+    for _ in range(cycles):
+        agent.history.clear()
+        agent.workspace.write("app.py", APP_SOURCE)
+        started = time.perf_counter()
+        agent.run_cycle("Change handler to return 2.")
+        walls.append(time.perf_counter() - started)
+    after = stage_totals()
+
+    def delta(name):
+        count, seconds = after.get(name, (0, 0.0))
+        old_count, old_seconds = before.get(name, (0, 0.0))
+        return count - old_count, seconds - old_seconds
+
+    model_calls, model_s = delta("model")
+    tool_calls, tool_s = delta("tool")
+    total = sum(walls)
+    return {
+        "cycles": cycles,
+        "model_calls": model_calls,
+        "tool_calls": tool_calls,
+        "cycle_ms_median": round(statistics.median(walls) * 1000, 2),
+        "step_ms": round(total / model_calls * 1000, 3),
+        "model_ms_per_call": round(model_s / model_calls * 1000, 3),
+        "tool_ms_per_call": round(tool_s / tool_calls * 1000, 3) if tool_calls else None,
+        "agent_overhead_ms_per_step": round((total - model_s - tool_s) / model_calls * 1000, 3),
+    }
+
+def bench_history(server, workspace, provider, cycles):
+    from melius.core.agent import MeliusAgent
+
+    agent = MeliusAgent(workspace_dir=workspace, provider=provider)
+    agent.run_cycle("warm up")
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    samples = []
+    for i in range(1, cycles + 1):
+        agent.workspace.write("app.py", APP_SOURCE)
+        agent.run_cycle(f"Task {i}: change handler to return 2.")
+        if i % max(cycles // 5, 1) == 0 or i == cycles:
+            samples.append({
+                "cycle": i,
+                "traced_kb": round((tracemalloc.get_traced_memory()[0] - baseline) / 1024, 1),
+                "messages": len(agent.history),
+                "history_tokens": agent.history.total_tokens,
+            })
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "cycles": cycles,
+        "token_budget": agent.history.token_budget,
+        "samples": samples,
+        "growth_kb_per_cycle": round(samples[-1]["traced_kb"] / cycles, 2),
+        "peak_kb": round((peak - baseline) / 1024, 1),
+    }
+
+def bench_parser(size, chunk):
+    text = make_response(size)
+    seconds, calls = bench_stream(text, chunk)
+    return {"bytes": len(text), "chunk": chunk, "seconds": round(seconds, 4), "calls": calls,
+            "mb_per_s": round(len(text) / seconds / 1e6, 1)}
+
+def bench_gateway(server, workspace, provider, chats, cycles_per_chat, latency):
+    from melius.core.agent import MeliusAgent
+    from melius.core.session import SessionStore
+    from melius.gateway.dispatcher import ChatDispatcher
+
+    shared = MeliusAgent(workspace_dir=workspace, provider=provider)
+    sessions = SessionStore(
+        lambda chat_id: MeliusAgent(workspace_dir=workspace, provider=provider, workspace=shared.workspace),
+        max_sessions=chats,
+    )
+    server.latency = latency
+    latencies = []
+
+    async def drive():
+        dispatcher = ChatDispatcher(max_workers=chats, max_queue=cycles_per_chat)
+        finished = asyncio.Event()
+        remaining = [chats * cycles_per_chat]
+
+        for chat_id in range(chats):
+            agent = sessions.get(chat_id)
+            for _ in range(cycles_per_chat):
+                submitted = time.perf_counter()
+
+                async def on_done(result, error, submitted=submitted):
+                    latencies.append(time.perf_counter() - submitted)
+                    remaining[0] -= 1
+                    if not remaining[0]:
+                        finished.set()
+
+                dispatcher.submit(chat_id, lambda agent=agent: agent.run_cycle("Change handler to return 2."), on_done)
+        await finished.wait()
+        dispatcher.shutdown()
+
+    started = time.perf_counter()
+    asyncio.run(drive())
+    wall = time.perf_counter() - started
+    server.latency = 0.0
+    latencies.sort()
+    steps_per_cycle = len(DEFAULT_SCRIPT) + 1
+    return {
+        "chats": chats,
+        "cycles": len(latencies),
+        "model_latency_s": latency,
+        "wall_s": round(wall, 3),
+        "cycles_per_s": round(len(latencies) / wall, 2),
+        "ideal_cycles_per_s": round(chats / (steps_per_cycle * latency), 2) if latency else None,
+        "job_latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 1),
+        "job_latency_ms_p95": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 1),
+    }
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--cycles", type=int, default=20)
+    cli.add_argument("--chats", type=int, default=8)
+    cli.add_argument("--chat-cycles", type=int, default=3)
+    cli.add_argument("--latency", type=float, default=0.05, help="Mock model latency for the gateway run")
+    cli.add_argument("--size", type=int, default=400, help="Prose characters before each tool call")
+    cli.add_argument("--provider", choices=["openrouter", "ollama"], default="openrouter")
+    cli.add_argument("--parser-size", type=int, default=1_000_000)
+    cli.add_argument("--output", help="Write the JSON here as well as to stdout")
+    args = cli.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # Keep config, caches and traces out of the real ~/.melius.
+        os.environ["HOME"] = home
+        from melius.core.agent import console
+        console.quiet = True
+
+        server = MockModelServer(size=args.size)
+        server.start()
+        workspace = make_workspace(os.path.join(home, "workspace"))
+        provider = make_provider(server, args.provider)
+        results = {
+            "python": sys.version.split()[0],
+            "provider": args.provider,
+            "steps": bench_steps(server, workspace, provider, args.cycles),
+            "history": bench_history(server, workspace, provider, args.cycles),
+            "parser": bench_parser(args.parser_size, 64),
+            "gateway": bench_gateway(server, workspace, provider, args.chats, args.chat_cycles, args.latency),
+            "mock_requests": server.requests,
+        }
+        server.stop()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
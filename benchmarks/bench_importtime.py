@@ -0,0 +1,78 @@
+"""Import-time regression benchmark for the `melius` CLI subcommands.
+
+Runs each read-only subcommand in a fresh interpreter with ``-X importtime``
+against a throwaway HOME, and reports total import time, wall time and the
+heaviest top-level imports as JSON.
+
+Usage: python benchmarks/bench_importtime.py [--runs 5] [--max-import-ms 250]
+
+Exits non-zero when any subcommand's median import time exceeds the limit.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COMMANDS = {
+    "help": ["--help"],
+    "skill list": ["skill", "list"],
+    "models list": ["models", "list"],
+    "gateway --help": ["gateway", "--help"],
+    "connect --help": ["connect", "--help"],
+}
+
+def measure(args, home):
+    env = dict(os.environ, HOME=home)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "melius.cli.main", *args],
+        capture_output=True, text=True, env=env
+    )
+    wall = time.perf_counter() - started
+    total_us = 0
+    top_level = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        if not name.startswith("  "):
+            top_level.append((int(cumulative_us), name.strip()))
+    top_level.sort(reverse=True)
+    return {
+        "returncode": proc.returncode,
+        "wall_ms": wall * 1000,
+        "import_ms": total_us / 1000,
+        "heaviest": [f"{name} ({us / 1000:.1f} ms)" for us, name in top_level[:5]],
+    }
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--runs", type=int, default=5)
+    cli.add_argument("--max-import-ms", type=float, default=None)
+    args = cli.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        for label, argv in COMMANDS.items():
+            runs = [measure(argv, home) for _ in range(args.runs)]
+            results[label] = {
+                "returncode": runs[-1]["returncode"],
+                "import_ms_median": round(statistics.median(r["import_ms"] for r in runs), 1),
+                "wall_ms_median": round(statistics.median(r["wall_ms"] for r in runs), 1),
+                "heaviest": runs[-1]["heaviest"],
+            }
+    print(json.dumps(results, indent=2))
+
+    if args.max_import_ms is not None:
+        slow = [k for k, v in results.items() if v["import_ms_median"] > args.max_import_ms]
+        if slow:
+            print(f"Import time over {args.max_import_ms} ms: {', '.join(slow)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
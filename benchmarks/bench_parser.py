@@ -0,0 +1,55 @@
+"""Micro-benchmark for the streaming tool-call parser.
+
+Usage: python benchmarks/bench_parser.py [--size 1000000] [--chunk 64]
+"""
+import argparse
+import json
+import re
+import time
+
+from melius.core.parser import ToolCallParser
+
+def make_response(size):
+    prose = "Looking at {config} and [notes], the dict {'a': 1} is fine. "
+    call = {"tool": "write_file", "parameters": {"path": "big.txt", "content": "x = {\"k\": [1, 2]}\n" * (size // 40)}}
+    return prose * (size // len(prose) // 2) + json.dumps(call) + " Done."
+
+def bench_stream(text, chunk):
+    parser = ToolCallParser()
+    started = time.perf_counter()
+    for i in range(0, len(text), chunk):
+        parser.feed(text[i:i + chunk])
+        if parser.done:
+            break
+    parser.close()
+    return time.perf_counter() - started, len(parser.calls)
+
+def bench_greedy_regex(text):
+    started = time.perf_counter()
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    try:
+        calls = 1 if "tool" in json.loads(match.group()) else 0
+    except ValueError:
+        calls = 0
+    return time.perf_counter() - started, calls
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--size", type=int, default=1_000_000)
+    cli.add_argument("--chunk", type=int, default=64)
+    args = cli.parse_args()
+
+    text = make_response(args.size)
+    stream_s, stream_calls = bench_stream(text, args.chunk)
+    whole_s, whole_calls = bench_stream(text, len(text))
+    regex_s, regex_calls = bench_greedy_regex(text)
+    print(json.dumps({
+        "bytes": len(text),
+        "chunk": args.chunk,
+        "streamed": {"seconds": round(stream_s, 4), "calls": stream_calls, "mb_per_s": round(len(text) / stream_s / 1e6, 1)},
+        "whole": {"seconds": round(whole_s, 4), "calls": whole_calls},
+        "greedy_regex": {"seconds": round(regex_s, 4), "calls": regex_calls},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Code search benchmarks on a generated large tree.
+
+Builds a synthetic workspace (``--files`` Python files, plus a .gitignore'd
+build directory), then reports JSON:
+
+- ``full_scan_ms``: a walk without cached directory listings (first scan)
+- ``index_build_ms``: building the search index over that tree
+- ``query_ms``: warm literal-query latency (median over several queries)
+- ``rescan_ms``: ``refresh`` after a shell command changed two files, using
+  the cached listings (what ``mark_stale`` now costs)
+- ``search_after_command_ms``: search right after ``mark_stale`` when the
+  search has to wait for the rescan
+- ``search_after_command_bg_ms``: the same, when the model's next turn
+  (``--model-delay``) gives the background rescan time to finish
+
+Usage: python benchmarks/bench_search.py [--files 100000] [--model-delay 1.0] [--output results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+QUERIES = ["def func_7_3_42", "return x + 99", "func_49", "pkg12", "x + 5"]
+
+def make_tree(root, files):
+    per_dir = 100
+    dirs = max(files // per_dir, 1)
+    for d in range(dirs):
+        directory = os.path.join(root, f"pkg{d // 20}", f"mod{d % 20}")
+        os.makedirs(directory, exist_ok=True)
+        for c in range(per_dir):
+            with open(os.path.join(directory, f"f{c}.py"), 'w') as f:
+                f.write(f"def func_{d // 20}_{d % 20}_{c}(x):\n    return x + {c}\n")
+    os.makedirs(os.path.join(root, "build"), exist_ok=True)
+    with open(os.path.join(root, "build", "out.py"), 'w') as f:
+        f.write("def func_ignored():\n    pass\n")
+    with open(os.path.join(root, ".gitignore"), 'w') as f:
+        f.write("build/\n*.pyc\n*.log\nnode_modules/\ndist/\n.venv/\n")
+    # A checkout nobody has touched for a while; fresh directories aren't trusted.
+    past = time.time() - 3600
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (past, past))
+    return dirs * per_dir
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+def simulate_command(root):
+    # What a typical shell command does: edit one file in place, create another.
+    with open(os.path.join(root, "pkg0", "mod0", "f0.py"), 'a') as f:
+        f.write("def freshly_added_function():\n    return 1\n")
+    with open(os.path.join(root, "pkg1", "mod1", "generated_new.py"), 'w') as f:
+        f.write("def another_new_function():\n    return 2\n")
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--files", type=int, default=100_000)
+    cli.add_argument("--model-delay", type=float, default=1.0, help="Seconds the model takes before the next search")
+    cli.add_argument("--output", help="Write the JSON here as well as to stdout")
+    args = cli.parse_args()
+
+    from melius.core.workspace import WorkspaceIndex
+
+    with tempfile.TemporaryDirectory() as root:
+        files = make_tree(root, args.files)
+        workspace = WorkspaceIndex(root)
+        full_scan_ms, _ = timed(lambda: workspace.refresh(force=True))
+        index = workspace.search_index()
+        index_build_ms, _ = timed(index.update)
+
+        query_times = []
+        for query in QUERIES * 3:
+            elapsed, _ = timed(lambda: index.search(query))
+            query_times.append(elapsed)
+
+        simulate_command(root)
+        rescan_ms, _ = timed(lambda: workspace.refresh(force=True))
+
+        simulate_command(root)
+        workspace.mark_stale(background=False)
+        sync_ms, found = timed(lambda: index.search("freshly_added_function"))
+
+        simulate_command(root)
+        workspace.mark_stale()
+        time.sleep(args.model_delay)
+        bg_ms, found_bg = timed(lambda: index.search("another_new_function"))
+
+        results = {
+            "python": sys.version.split()[0],
+            "files": files,
+            "full_scan_ms": round(full_scan_ms, 1),
+            "index_build_ms": round(index_build_ms, 1),
+            "query_ms": round(statistics.median(query_times), 2),
+            "rescan_ms": round(rescan_ms, 1),
+            "search_after_command_ms": round(sync_ms, 1),
+            "search_after_command_bg_ms": round(bg_ms, 2),
+            "model_delay_s": args.model_delay,
+            "found_after_command": bool(found["matches"]) and bool(found_bg["matches"]),
+        }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
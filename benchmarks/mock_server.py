@@ -0,0 +1,213 @@
+"""Local stand-in for the OpenRouter and Ollama chat APIs.
+
+Replays a scripted tool-call sequence. The reply to a request depends on how
+many assistant turns follow the latest task message in its history, so every
+task (and every concurrent chat) walks the script from the start. Latency,
+streaming chunk size and the amount of prose before each tool call are
+configurable. The Ollama side also serves ``/api/tags``, ``/api/ps`` and
+model loads through ``/api/generate``; a model that isn't loaded costs
+``load_delay`` seconds on its first request, like a cold load.
+
+Usage: python benchmarks/mock_server.py [--port 8765] [--latency 0.05] [--size 2000] [--load-delay 0]
+       [--script steps.json]
+
+A script is a JSON list. Each step is a tool call ``{"tool": ..., "parameters": ...}``,
+a list of calls (one parallel batch) or ``{"text": ...}`` for a final answer.
+Once the script runs out the server answers with plain text.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from aiohttp import web
+
+DEFAULT_SCRIPT = [
+    {"tool": "read_file", "parameters": {"path": "app.py"}},
+    [
+        {"tool": "list_files", "parameters": {"path": ".", "max_depth": 1}},
+        {"tool": "search_code", "parameters": {"query": "def handler"}},
+    ],
+    {"tool": "edit_file", "parameters": {"path": "app.py", "old_text": "return 1", "new_text": "return 2"}},
+]
+
+FILLER = "Let me look at the relevant code before changing anything. "
+# The agent's follow-up after each observation; any other user message starts a new task.
+CONTINUE_PREFIX = "Continue based on the observation"
+
+class MockModelServer:
+    def __init__(self, script=None, latency=0.0, chunk_chars=64, chunk_delay=0.0, size=400, host="127.0.0.1", port=0,
+                 load_delay=0.0, models=("llama3:latest",)):
+        self.script = DEFAULT_SCRIPT if script is None else script
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.size = size
+        self.host = host
+        self.port = port
+        self.load_delay = load_delay
+        self.models = list(models)
+        self.loaded = set()
+        self.loads = 0
+        self.active = 0
+        self.max_active = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self._loop = None
+        self._runner = None
+
+    def reply_for(self, messages):
+        step = 0
+        for message in reversed(messages):
+            if message.get("role") == "assistant":
+                step += 1
+            elif message.get("role") == "user" and not (message.get("content") or "").startswith(CONTINUE_PREFIX):
+                break
+        prose = (FILLER * (self.size // len(FILLER) + 1))[:self.size]
+        if step >= len(self.script) or "text" in self.script[step]:
+            text = self.script[step]["text"] if step < len(self.script) else "All done."
+            return f"{prose}\n{text}"
+        return f"{prose}\n{json.dumps(self.script[step])}\nI'll wait for the result."
+
+    def _chunks(self, text):
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+    async def _load(self, body):
+        name = body.get("model") or ""
+        name = name if ":" in name else name + ":latest"
+        if body.get("keep_alive") in (0, "0"):
+            self.loaded.discard(name)
+        elif name not in self.loaded:
+            self.loads += 1
+            await asyncio.sleep(self.load_delay)
+            self.loaded.add(name)
+
+    async def _stream(self, request, encode):
+        body = await request.json()
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if request.path == "/api/chat":
+                await self._load(body)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        response = web.StreamResponse()
+        await response.prepare(request)
+        try:
+            for chunk in self._chunks(self.reply_for(body.get("messages", []))):
+                data = encode(chunk)
+                await response.write(data)
+                self.bytes_sent += len(data)
+                if self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+        except (ConnectionResetError, RuntimeError):
+            return response  # the client stopped reading at the tool call
+        return response
+
+    async def openrouter(self, request):
+        def encode(chunk):
+            return f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n".encode()
+        response = await self._stream(request, encode)
+        try:
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionResetError, RuntimeError):
+            pass
+        return response
+
+    async def ollama(self, request):
+        def encode(chunk):
+            return (json.dumps({"message": {"content": chunk}, "done": False}) + "\n").encode()
+        response = await self._stream(request, encode)
+        try:
+            await response.write(b'{"done": true}\n')
+        except (ConnectionResetError, RuntimeError):
+            pass
+        return response
+
+    async def generate(self, request):
+        body = await request.json()
+        await self._load(body)
+        return web.json_response({"model": body.get("model"), "response": "", "done": True})
+
+    async def tags(self, request):
+        names = sorted(set(self.models) | self.loaded)
+        return web.json_response({"models": [{"name": name, "size": 4_700_000_000, "details": {
+            "parameter_size": "8B", "quantization_level": "Q4_0"}} for name in names]})
+
+    async def ps(self, request):
+        return web.json_response({"models": [{"name": name, "expires_at": "2099-01-01T00:00:00Z"}
+                                             for name in sorted(self.loaded)]})
+
+    def start(self):
+        """Start serving on a background thread; returns the bound port."""
+        app = web.Application()
+        app.router.add_post("/api/v1/chat/completions", self.openrouter)
+        app.router.add_post("/api/chat", self.ollama)
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/api/ps", self.ps)
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        async def serve():
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, self.host, self.port)
+            await site.start()
+            self.port = self._runner.addresses[0][1]
+            ready.set()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="mock-model-server", daemon=True).start()
+        ready.wait()
+        return self.port
+
+    @property
+    def openrouter_url(self):
+        return f"http://{self.host}:{self.port}/api/v1/chat/completions"
+
+    @property
+    def ollama_host(self):
+        return f"http://{self.host}:{self.port}"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--port", type=int, default=8765)
+    cli.add_argument("--latency", type=float, default=0.0, help="Seconds before the first byte")
+    cli.add_argument("--chunk-chars", type=int, default=64)
+    cli.add_argument("--chunk-delay", type=float, default=0.0)
+    cli.add_argument("--size", type=int, default=400, help="Characters of prose before each tool call")
+    cli.add_argument("--load-delay", type=float, default=0.0, help="Seconds an Ollama cold load takes")
+    cli.add_argument("--script", help="JSON file with the tool-call sequence")
+    args = cli.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, 'r') as f:
+            script = json.load(f)
+    server = MockModelServer(script, args.latency, args.chunk_chars, args.chunk_delay, args.size, port=args.port,
+                             load_delay=args.load_delay)
+    server.start()
+    print(f"OpenRouter: {server.openrouter_url}\nOllama:     {server.ollama_host}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
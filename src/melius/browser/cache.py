@@ -0,0 +1,244 @@
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from html.parser import HTMLParser
+
+class _TextExtractor(HTMLParser):
+    SKIP = {"script", "style", "noscript", "template"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+def extract_text(html):
+    try:
+        from bs4 import BeautifulSoup
+        text = BeautifulSoup(html, 'html.parser').get_text()
+    except ImportError:
+        extractor = _TextExtractor()
+        extractor.feed(html)
+        text = "".join(extractor.parts)
+    return re.sub(r'\n\s*\n+', '\n\n', text).strip()
+
+class WebCache:
+    """On-disk HTTP cache plus a cache of extracted page text.
+
+    Bodies and extracted text are stored by content hash, so revalidated or
+    re-rendered pages with unchanged content reuse the same files. Entries are
+    revalidated with ETag/Last-Modified once older than ``fresh_for`` seconds
+    (or the response's ``max-age``). ``no-store`` responses are served but
+    never written. Files are written to a temporary name and renamed into
+    place, so concurrent readers never see a partial file. The least recently
+    used entries are evicted once the total size passes ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir="~/.melius/cache/web", max_bytes=256 * 1024 * 1024, fresh_for=60, timeout=10):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.timeout = timeout
+        os.makedirs(os.path.join(self.cache_dir, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._session = None
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (url TEXT PRIMARY KEY, hash TEXT, etag TEXT, "
+            "last_modified TEXT, fresh_until REAL, size INTEGER, last_access REAL)"
+        )
+        self.db.commit()
+
+    def _blob(self, content_hash, suffix):
+        return os.path.join(self.cache_dir, "blobs", content_hash + suffix)
+
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _http(self):
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+            self._session.headers["User-Agent"] = "Melius/0.1"
+        return self._session
+
+    def _lookup(self, url):
+        with self._lock:
+            return self.db.execute(
+                "SELECT hash, etag, last_modified, fresh_until FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+
+    def fresh_hash(self, url):
+        """Hash of the stored body for ``url`` if it can be served without revalidating."""
+        entry = self._lookup(url)
+        if entry and entry[3] > time.time() and os.path.exists(self._blob(entry[0], ".html")):
+            self._touch(url)
+            return entry[0]
+        return None
+
+    def fetch(self, url):
+        """Return ``(content_hash, source, text)``; source is hit, revalidated, fetched or uncached.
+
+        ``text`` is the extracted text of an ``uncached`` (``no-store``) page
+        and None otherwise; the others are read back with ``text()``.
+        """
+        content_hash = self.fresh_hash(url)
+        if content_hash:
+            return content_hash, "hit", None
+
+        entry = self._lookup(url)
+        headers = {}
+        if entry:
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+        response = self._http().get(url, headers=headers, timeout=self.timeout)
+        fresh_until = time.time() + _max_age(response.headers.get("Cache-Control"), self.fresh_for)
+        if response.status_code == 304 and entry and os.path.exists(self._blob(entry[0], ".html")):
+            with self._lock:
+                self.db.execute(
+                    "UPDATE entries SET fresh_until = ?, last_access = ? WHERE url = ?", (fresh_until, time.time(), url)
+                )
+                self.db.commit()
+            return entry[0], "revalidated", None
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if not _is_text(content_type):
+            raise ValueError(f"{url} is not a text document ({content_type.split(';')[0]})")
+        if "no-store" in (response.headers.get("Cache-Control") or ""):
+            self.forget(url)
+            return hashlib.sha256(response.content).hexdigest(), "uncached", extract_text(response.text)
+        content_hash = self.store(
+            url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"), fresh_until
+        )
+        return content_hash, "fetched", None
+
+    def store(self, url, html, etag=None, last_modified=None, fresh_until=None):
+        """Record ``html`` for ``url`` (e.g. a browser-rendered page) and return its hash."""
+        data = html.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob(content_hash, ".html")
+        if not os.path.exists(path):
+            self._write(path, data)
+        if fresh_until is None:
+            fresh_until = time.time() + self.fresh_for
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, content_hash, etag, last_modified, fresh_until, len(data), time.time())
+            )
+            self.db.commit()
+        self._evict()
+        return content_hash
+
+    def text(self, content_hash, extracted=None):
+        """Extracted text for a stored body, computed once per content hash."""
+        path = self._blob(content_hash, ".txt")
+        if extracted is None and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        if extracted is None:
+            with open(self._blob(content_hash, ".html"), 'r', encoding='utf-8') as f:
+                extracted = extract_text(f.read())
+        self._write(path, extracted.encode("utf-8"))
+        return extracted
+
+    def read(self, url, offset=0, length=4000, known_hash=None):
+        """Fetch ``url`` through the cache and return one chunk of its text."""
+        content_hash, source, text = self.fetch(url)
+        return self.chunk(url, content_hash, source, offset, length, known_hash, text)
+
+    def chunk(self, url, content_hash, source, offset=0, length=4000, known_hash=None, text=None):
+        result = {"url": url, "hash": content_hash, "source": source}
+        if known_hash and known_hash == content_hash:
+            result["unchanged"] = True
+            return result
+        if text is None:
+            text = self.text(content_hash)
+        offset = max(int(offset), 0)
+        result.update(offset=offset, total=len(text), text=text[offset:offset + int(length)])
+        if offset + int(length) < len(text):
+            result["next_offset"] = offset + int(length)
+        return result
+
+    def _touch(self, url):
+        with self._lock:
+            self.db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+
+    def _drop(self, url, content_hash):
+        # Caller holds the lock. Blobs go once no other URL points at them.
+        self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        shared = self.db.execute("SELECT 1 FROM entries WHERE hash = ?", (content_hash,)).fetchone()
+        if not shared:
+            for suffix in (".html", ".txt"):
+                if os.path.exists(self._blob(content_hash, suffix)):
+                    os.remove(self._blob(content_hash, suffix))
+
+    def forget(self, url):
+        """Remove ``url`` from the cache (e.g. it is now served with ``no-store``)."""
+        with self._lock:
+            row = self.db.execute("SELECT hash FROM entries WHERE url = ?", (url,)).fetchone()
+            if row:
+                self._drop(url, row[0])
+                self.db.commit()
+
+    def _evict(self):
+        with self._lock:
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for url, content_hash, size in self.db.execute(
+                "SELECT url, hash, size FROM entries ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_bytes * 0.9:
+                    break
+                self._drop(url, content_hash)
+                total -= size
+            self.db.commit()
+
+def _is_text(content_type):
+    """Whether a Content-Type is worth extracting text from (a missing one is assumed to be)."""
+    media = content_type.split(";")[0].strip().lower()
+    return not media or media.startswith("text/") or any(
+        kind in media for kind in ("html", "xml", "json", "javascript")
+    )
+
+def _max_age(cache_control, default):
+    match = re.search(r'max-age=(\d+)', cache_control or "")
+    if cache_control and "no-cache" in cache_control:
+        return 0
+    return int(match.group(1)) if match else default
+
+_cache = None
+
+def get_web_cache(**options):
+    """Return the process-wide cache; ``options`` only apply on first use."""
+    global _cache
+    if _cache is None:
+        _cache = WebCache(**options)
+    return _cache
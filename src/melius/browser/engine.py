@@ -1,28 +1,174 @@
 import asyncio
+import atexit
+from contextlib import asynccontextmanager
 from playwright.async_api import async_playwright
+from melius.browser.cache import get_web_cache
+from melius.core.runtime import get_background_loop
 
-class MeliusBrowser:
-    def __init__(self):
+DEFAULT_BLOCKED_RESOURCES = ("image", "font", "media")
+
+class PageSlot:
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+class BrowserPool:
+    """One long-lived Chromium process serving a bounded pool of contexts/pages.
+
+    Pages are reused across navigations and recycled (context closed) after
+    ``max_uses``. Requests whose resource type is in ``blocked_resources``
+    are aborted before they hit the network.
+    """
+
+    def __init__(self, max_pages=4, max_uses=50, blocked_resources=DEFAULT_BLOCKED_RESOURCES, headless=True):
+        self.max_pages = max_pages
+        self.max_uses = max_uses
+        self.blocked_resources = frozenset(blocked_resources)
+        self.headless = headless
+        self.playwright = None
         self.browser = None
+        self.idle = []
+        self._slots = None
+        self._start_lock = None
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_pages)
+        async with self._start_lock:
+            if self.browser is None or not self.browser.is_connected():
+                if self.playwright is None:
+                    self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+                self.idle.clear()
+
+    async def _block(self, route):
+        if route.request.resource_type in self.blocked_resources:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def acquire(self):
+        await self.start()
+        await self._slots.acquire()
+        try:
+            while self.idle:
+                slot = self.idle.pop()
+                if not slot.page.is_closed():
+                    return slot
+            context = await self.browser.new_context()
+            if self.blocked_resources:
+                await context.route("**/*", self._block)
+            return PageSlot(context, await context.new_page())
+        except Exception:
+            self._slots.release()
+            raise
+
+    async def release(self, slot):
+        slot.uses += 1
+        try:
+            if slot.uses >= self.max_uses or slot.page.is_closed():
+                await slot.context.close()
+            else:
+                self.idle.append(slot)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def page(self):
+        slot = await self.acquire()
+        try:
+            yield slot.page
+        except Exception:
+            # A page that failed mid-navigation may be in a bad state.
+            slot.uses = self.max_uses
+            raise
+        finally:
+            await self.release(slot)
+
+    async def fetch(self, url, timeout=30000):
+        """Navigate a pooled page and return ``(title, html, text)``."""
+        async with self.page() as page:
+            await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+            return await page.title(), await page.content(), await page.inner_text("body")
+
+    async def close(self):
+        for slot in self.idle:
+            await slot.context.close()
+        self.idle.clear()
+        if self.browser:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+_pool = None
+
+def _close_pool():
+    if _pool.browser or _pool.playwright:
+        try:
+            get_background_loop().run(_pool.close(), timeout=10)
+        except Exception:
+            pass
+
+def get_browser_pool(**options):
+    """Return the process-wide pool; ``options`` only apply on first use."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool(**options)
+        atexit.register(_close_pool)
+    return _pool
+
+def run_in_browser_loop(coro):
+    """Await ``coro`` on the background loop that owns the shared pool."""
+    return asyncio.wrap_future(get_background_loop().submit(coro))
+
+class MeliusBrowser:
+    """A single-page session on top of the shared ``BrowserPool``."""
+
+    def __init__(self, pool=None, cache=None):
+        if pool is None or cache is None:
+            # The shared pool and cache take their options on first use; pass the saved ones.
+            from melius.models.provider import ModelProvider
+            config = ModelProvider().config
+            pool = pool or get_browser_pool(**config.get("browser", {}))
+            cache = cache or get_web_cache(**config.get("web_cache", {}))
+        self.pool = pool
+        self.cache = cache
+        self.slot = None
         self.page = None
 
     async def start(self):
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=True)
-        self.page = await self.browser.new_page()
+        if not self.slot:
+            self.slot = await run_in_browser_loop(self.pool.acquire())
+            self.page = self.slot.page
 
     async def navigate(self, url):
         if not self.page:
             await self.start()
-        await self.page.goto(url)
+        return await run_in_browser_loop(self._navigate(url))
+
+    async def _navigate(self, url):
+        await self.page.goto(url, wait_until="domcontentloaded")
         return await self.page.title()
 
     async def get_content(self):
         if self.page:
-            return await self.page.content()
+            html = await run_in_browser_loop(self.page.content())
+            self.cache.store("render:" + self.page.url, html)
+            return html
         return ""
 
+    async def get_text(self, offset=0, length=4000, known_hash=None):
+        """Extracted text of the current page, served from the web cache when unchanged."""
+        if not self.page:
+            return {}
+        content_hash = self.cache.store("render:" + self.page.url, await run_in_browser_loop(self.page.content()))
+        return self.cache.chunk(self.page.url, content_hash, "rendered", offset, length, known_hash)
+
     async def close(self):
-        if self.browser:
-            await self.browser.close()
-            await self.playwright.stop()
+        if self.slot:
+            slot, self.slot, self.page = self.slot, None, None
+            await run_in_browser_loop(self.pool.release(slot))
@@ -2,17 +2,17 @@ import click
 import os
 import json
 from rich.console import Console
-from rich.panel import Panel
-from rich.text import Text
-from rich.table import Table
-from melius.gateway.telegram_handler import MeliusGateway
-from melius.models.provider import ModelProvider
-from melius.skills.manager import SkillManager
-from melius.core.agent import MeliusAgent
+
+# Subcommands import what they need when they run: scripts call e.g.
+# `melius skill list` in loops, and python-telegram-bot, requests and the
+# agent stack add hundreds of milliseconds of import time.
 
 console = Console()
 
 def print_banner():
+    from rich.panel import Panel
+    from rich.text import Text
+
     banner = Text("MELIUS", style="bold cyan")
     banner.append("\nAI Coding Agent & Remote Gateway", style="italic magenta")
     console.print(Panel(banner, border_style="blue", expand=False))
@@ -34,6 +34,7 @@ def gateway():
     with open(config_path, 'r') as f:
         config = json.load(f)
     
+    from melius.gateway.telegram_handler import MeliusGateway
     gateway = MeliusGateway(config['token'], config.get('allowed_user_id'))
     gateway.run()
 
@@ -62,6 +63,7 @@ def connect(token, user_id):
 def skill(action, skill_name, url):
     """Manage and download agent skills."""
     print_banner()
+    from melius.skills.manager import SkillManager
     manager = SkillManager()
     if action == 'list':
         manager.list_skills()
@@ -84,14 +86,19 @@ def browser(url):
     print_banner()
     console.print(f"[blue]Launching Melius Browser for: {url}[/blue]")
     # In production, this would trigger the Playwright engine
-    from melius.browser.engine import MeliusBrowser
+    from melius.browser.cache import get_web_cache
+    from melius.browser.engine import MeliusBrowser, get_browser_pool
+    from melius.models.provider import ModelProvider
     import asyncio
     
     async def run_browser():
-        b = MeliusBrowser()
-        title = await b.navigate(url)
-        console.print(f"Page Title: [bold]{title}[/bold]")
-        await b.close()
+        config = ModelProvider().config
+        b = MeliusBrowser(get_browser_pool(**config.get("browser", {})), get_web_cache(**config.get("web_cache", {})))
+        try:
+            title = await b.navigate(url)
+            console.print(f"Page Title: [bold]{title}[/bold]")
+        finally:
+            await b.close()
     
     asyncio.run(run_browser())
 
@@ -99,16 +106,24 @@ def browser(url):
 def improve():
     """Initiate the self-improvement protocol."""
     print_banner()
+    from melius.core.agent import MeliusAgent
+    from melius.skills.manager import SkillManager
     agent = MeliusAgent()
     manager = SkillManager()
     manager.improve_agent(agent)
 
 @main.command()
-@click.argument('action', type=click.Choice(['list', 'set-provider', 'add-key', 'ollama-install']))
+@click.argument('action', type=click.Choice(
+    ['list', 'set-provider', 'add-key', 'ollama-install', 'ollama-load', 'ollama-pin', 'ollama-unload']
+))
 @click.argument('value', required=False)
 def models(action, value):
-    """Manage AI models and API keys."""
+    """Manage AI models and API keys.
+
+    ollama-load/-pin/-unload take a model name (default: the configured Ollama model).
+    """
     print_banner()
+    from melius.models.provider import ModelProvider
     provider = ModelProvider()
     if action == 'list':
         console.print(f"Active Provider: [bold green]{provider.config['active_provider']}[/bold green]")
@@ -130,6 +145,82 @@ def models(action, value):
         console.print("[green]API Key added.[/green]")
     elif action == 'ollama-install':
         provider.install_ollama()
+    else:
+        verb = {'ollama-load': 'Loading', 'ollama-pin': 'Pinning', 'ollama-unload': 'Unloading'}[action]
+        with console.status(f"{verb} {value or provider.config['ollama_model']}..."):
+            console.print(provider.manage_ollama(action[len('ollama-'):], value))
+
+@main.command()
+@click.argument('tasks_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', default='results.jsonl', show_default=True, help='Results JSONL (also used to resume)')
+@click.option('--workspaces', default='melius-runs', show_default=True, help='Directory for per-task workspaces')
+@click.option('--concurrency', '-j', type=int, default=None, help='Tasks in flight at once (default: config batch.concurrency)')
+@click.option('--max-steps', type=int, default=25, show_default=True)
+@click.option('--max-seconds', type=int, default=900, show_default=True)
+@click.option('--retry-failed', is_flag=True, help='Re-run tasks recorded with status "error"')
+@click.option('--verbose', is_flag=True, help='Show command output from every task')
+def run(tasks_file, output, workspaces, concurrency, max_steps, max_seconds, retry_failed, verbose):
+    """Run a JSONL file of tasks headlessly, each in its own workspace."""
+    print_banner()
+    from melius.core.batch import BatchRunner, load_tasks
+    from melius.models.provider import ModelProvider
+
+    try:
+        tasks = load_tasks(tasks_file)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        return
+    if not verbose:
+        from melius.core import agent
+        agent.console.quiet = True
+    provider = ModelProvider()
+    concurrency = concurrency or provider.config["batch"].get("concurrency", 4)
+    runner = BatchRunner(output, workspaces, concurrency, provider, max_steps, max_seconds, retry_failed)
+
+    def report(record):
+        color = {"ok": "green", "stopped": "yellow"}.get(record["status"], "red")
+        lines = (record.get("result") or "").strip().splitlines()
+        detail = " ".join((record.get("error") or (lines[-1] if lines else "")).split())
+        if record.get("workspace_reset"):
+            detail = "(leftover workspace reset) " + detail
+        console.print(f"[{color}]{record['status']:>9}[/{color}] {record['id']} ({record['seconds']}s) [dim]{detail[:100]}[/dim]")
+
+    provider.warm_up()
+    console.print(f"Running {len(tasks)} tasks, {concurrency} at a time -> {output}")
+    try:
+        counts = runner.run(tasks, on_result=report)
+    except KeyboardInterrupt:
+        console.print("[yellow]Interrupted; unfinished tasks will run on the next invocation.[/yellow]")
+        return
+    console.print("Done: " + ", ".join(f"{status} {count}" for status, count in counts.items()))
+
+@main.command()
+@click.option('--hours', type=float, default=24, help='Only spans from the last N hours (0 for all)')
+@click.option('--by-label', is_flag=True, help='Split stages by tool, model or skill name')
+@click.option('--as-json', 'as_json', is_flag=True, help='Print the summary as JSON')
+def stats(hours, by_label, as_json):
+    """Summarize latency per stage (p50/p95) from the local traces."""
+    import time
+    from melius.core.tracing import load_spans, summarize
+    from melius.models.provider import ModelProvider
+
+    directory = ModelProvider().config["tracing"].get("directory", "~/.melius/traces")
+    since = time.time() - hours * 3600 if hours else None
+    rows = summarize(load_spans(directory, since), by_label)
+    if as_json:
+        click.echo(json.dumps(rows, indent=2))
+        return
+    print_banner()
+    if not rows:
+        console.print(f"[yellow]No traces in {directory} for that period.[/yellow]")
+        return
+    from rich.table import Table
+    table = Table(title=f"Stage latency ({'all time' if not hours else f'last {hours:g}h'})")
+    for column in ("stage", "count", "p50_ms", "p95_ms", "max_ms", "total_s", "errors", "tokens", "bytes", "cache_hit_rate"):
+        table.add_column(column, justify="left" if column == "stage" else "right")
+    for row in rows:
+        table.add_row(*("-" if value is None else str(value) for value in row.values()))
+    console.print(table)
 
 if __name__ == "__main__":
     main()
@@ -1,128 +1,433 @@
 import os
-import subprocess
-import json
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
-from melius.models.provider import ModelProvider
+from melius.core.history import CONTINUE_PROMPT, ConversationHistory, estimate_tokens
+from melius.core.parser import ToolCallParser
+from melius.core.process import run_command
+from melius.core.runtime import get_background_loop
+from melius.core.tracing import bind, get_tracer
+from melius.core.workspace import WorkspaceIndex
+from melius.models.provider import ErrorText, ModelProvider
 
 console = Console()
 
+# How each tool touches the workspace; decides which calls may run in parallel.
+TOOL_ACCESS = {
+    "browse_web": "net",
+    "read_file": "read",
+    "list_files": "read",
+    "search_code": "read",
+    "execute_command": "write",
+    "write_file": "write",
+    "edit_file": "write",
+    "git_op": "write",
+    "run_skill": "write",
+}
+
+def _tool(tool, description, required, **properties):
+    return {"type": "function", "function": {
+        "name": tool,
+        "description": description,
+        "parameters": {"type": "object", "properties": properties, "required": required},
+    }}
+
+_STR, _INT, _BOOL = {"type": "string"}, {"type": "integer"}, {"type": "boolean"}
+
+# JSON schemas for provider-native tool calling (``context.native_tools``);
+# the system prompt documents the same tools for the plain-text protocol.
+TOOL_SCHEMAS = [
+    _tool("execute_command", "Run a shell command in the workspace.", ["command"], command=_STR),
+    _tool("read_file", "Read a file, or a 1-based inclusive line range.", ["path"],
+          path=_STR, start_line=_INT, end_line=_INT),
+    _tool("write_file", "Write or overwrite a file.", ["path", "content"], path=_STR, content=_STR),
+    _tool("edit_file", "Replace one occurrence of old_text; occurrence (1-based) picks among several matches.",
+          ["path", "old_text", "new_text"], path=_STR, old_text=_STR, new_text=_STR, occurrence=_INT),
+    _tool("git_op", "Git on a repo in the workspace: clone, status, diff, commit, push, pull or log.", ["action"],
+          action={"type": "string", "enum": ["clone", "status", "diff", "commit", "push", "pull", "log"]},
+          path=_STR, repo_url=_STR, depth=_INT, partial=_BOOL, branch=_STR, staged=_BOOL,
+          files={"type": "array", "items": _STR}, message=_STR, remote=_STR, limit=_INT),
+    _tool("browse_web", "Read a web page's text; page with offset, skip unchanged pages with known_hash.", ["url"],
+          url=_STR, render=_BOOL, offset=_INT, length=_INT, known_hash=_STR),
+    _tool("run_skill", "Run an installed skill plugin with keyword arguments.", ["name"],
+          name=_STR, args={"type": "object"}),
+    _tool("list_files", "List workspace files (respects .gitignore).", [],
+          path=_STR, pattern=_STR, max_depth=_INT),
+    _tool("search_code", "Search file contents; path is a glob like src/*.py.", ["query"],
+          query=_STR, regex=_BOOL, path=_STR, max_results=_INT),
+]
+
 class MeliusAgent:
-    def __init__(self, workspace_dir="workspace", provider=None):
+    def __init__(self, workspace_dir="workspace", provider=None, history_token_budget=24000,
+                 max_steps=25, max_seconds=900, max_tokens=400000, max_parallel_tools=4, skills=None,
+                 workspace=None):
         self.workspace_dir = os.path.abspath(workspace_dir)
         if not os.path.exists(self.workspace_dir):
             os.makedirs(self.workspace_dir)
+        self.workspace = workspace or WorkspaceIndex(self.workspace_dir)
+        self.max_read_chars = 20000
         self.provider = provider or ModelProvider()
-        self.history = []
+        self.skills = skills
+        self.history = ConversationHistory(token_budget=history_token_budget)
+        self.cancel_event = threading.Event()
+        self.on_output = None
+        self.on_progress = None
+        self.last_error = None
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.tracer = get_tracer(**self.provider.config.get("tracing", {}))
+        self.tool_pool = ThreadPoolExecutor(max_workers=max_parallel_tools, thread_name_prefix="melius-tool")
         self.system_prompt = """You are Melius, a high-performance AI coding agent.
 You operate in a workspace and can execute commands, read/write files, and browse the web.
 When you need to act, output a JSON block with "tool" and "parameters".
+To run several independent tools at once, output a JSON list of such blocks.
 
 Available Tools:
 1. execute_command(command: str) - Run shell commands.
-2. read_file(path: str) - Read file content.
+2. read_file(path: str, start_line: int = None, end_line: int = None) - Read file content, or a 1-based inclusive line range.
 3. write_file(path: str, content: str) - Write or overwrite a file.
-4. edit_file(path: str, old_text: str, new_text: str) - Replace text in a file.
-5. git_op(action: str, repo_url: str = None, message: str = None) - Git operations.
-6. browse_web(url: str) - Search or visit a website.
+4. edit_file(path: str, old_text: str, new_text: str, occurrence: int = None) - Replace one occurrence of text in a file.
+   old_text must be unique in the file unless occurrence (1-based) says which match to change.
+5. git_op(action: str, path: str = ".", ...) - Git on a repo in the workspace. Actions: "clone" (repo_url, path, depth=1, partial=false, branch), "status", "diff" (staged=false, files), "commit" (message; stages only files changed since the last commit), "push" (remote="origin", branch; runs in the background, result appears in "status"), "pull", "log" (limit=10).
+6. browse_web(url: str, render: bool = False, offset: int = 0, length: int = 4000, known_hash: str = None) - Read a web page's text.
+   Results are cached: use next_offset to page through long documents and pass a previous "hash" as known_hash to skip unchanged pages.
+   render=true runs JavaScript in a real browser.
+7. run_skill(name: str, args: dict = {}) - Run an installed skill plugin with keyword arguments.
+8. list_files(path: str = ".", pattern: str = None, max_depth: int = None) - List workspace files (respects .gitignore).
+9. search_code(query: str, regex: bool = False, path: str = None, max_results: int = 30) - Search file contents; returns ranked matches with line numbers and context. `path` is a glob like "src/*.py".
 
 Example Output:
 {
     "thought": "I need to check the code.",
     "tool": "read_file",
     "parameters": {"path": "main.py"}
-}"""
+}
+
+Parallel Example:
+[
+    {"tool": "read_file", "parameters": {"path": "main.py"}},
+    {"tool": "read_file", "parameters": {"path": "utils.py"}}
+]"""
+        self.system_prompt += self.skills_prompt()
 
     def run_cycle(self, user_input):
+        """Run the tool loop for one user message until the model answers or a budget runs out."""
+        with self.tracer.span("cycle") as span:
+            return self._run_cycle(user_input, span)
+
+    def _run_cycle(self, user_input, span):
         self.history.append({"role": "user", "content": user_input})
-        raw_response = self.provider.query_model(self.system_prompt, self.history)
-        
-        # Parse tool calls
-        json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-        if json_match:
+        self.last_error = None
+        started = time.monotonic()
+        tokens_used = 0
+        raw_response = ""
+        for step in range(self.max_steps):
+            if self.cancel_event.is_set():
+                return "Task cancelled."
+            if time.monotonic() - started > self.max_seconds:
+                return f"Stopped: time budget of {self.max_seconds}s exhausted.\n{raw_response}"
+            if tokens_used > self.max_tokens:
+                return f"Stopped: token budget of {self.max_tokens} exhausted.\n{raw_response}"
+
+            tokens_used += self.history.total_tokens
+            raw_response, calls, errors = self.stream_response()
+            tokens_used += estimate_tokens(raw_response)
+            span.set(steps=step + 1, tokens_used=tokens_used)
+            if self.last_error:
+                return raw_response
+            if not calls and not errors:
+                self.history.append({"role": "assistant", "content": raw_response})
+                return raw_response
+
+            if not calls:
+                observation = "Observation: your tool call could not be parsed, resend it as valid JSON.\n" + "\n".join(
+                    str(error) for error in errors
+                )
+            elif len(calls) == 1:
+                observation = f"Observation: {self.dispatch_tools(calls)[0][1]}"
+            else:
+                results = self.dispatch_tools(calls)
+                observation = "Observations:\n" + "\n".join(
+                    f"[{i}] {tool}: {result}" for i, (tool, result) in enumerate(results, 1)
+                )
+            self.history.append({"role": "assistant", "content": raw_response})
+            self.history.append({"role": "system", "content": observation})
+            self.history.append({"role": "user", "content": CONTINUE_PROMPT})
+        return f"Stopped: step budget of {self.max_steps} tool rounds exhausted.\n{raw_response}"
+
+    def stream_response(self):
+        """Stream the model reply, stopping as soon as a tool-call JSON block closes.
+
+        Returns ``(raw_response, calls, errors)``. A provider failure is also
+        recorded in ``last_error``.
+        """
+        raw_response = ""
+        parser = ToolCallParser()
+        tools = TOOL_SCHEMAS if self.provider.config["context"].get("native_tools") else None
+        stream = self.provider.stream_model(self.system_prompt, self.history, tools=tools)
+        try:
+            for chunk in stream:
+                raw_response += chunk
+                if isinstance(chunk, ErrorText):
+                    self.last_error = str(chunk)
+                    break
+                parser.feed(chunk)
+                if parser.done:
+                    break
+        finally:
+            stream.close()
+        parser.close()
+        return raw_response, parser.calls, parser.errors
+
+    def dispatch_tools(self, calls):
+        """Run tool calls in batches; calls within a batch run concurrently.
+
+        Network-only tools never conflict. Reads may share a batch with other
+        reads, while anything that changes the workspace runs on its own.
+        """
+        batches = []
+        for call in calls:
+            access = TOOL_ACCESS.get(call.get("tool"), "write")
+            batch = batches[-1] if batches else None
+            if batch is not None and (access == "net" or not batch["write"] and (access == "read" or not batch["read"])):
+                batch["calls"].append(call)
+            else:
+                batch = {"calls": [call], "read": False, "write": False}
+                batches.append(batch)
+            batch[access] = True
+
+        results = []
+        for batch in batches:
+            if len(batch["calls"]) == 1:
+                results.append(self._run_tool(batch["calls"][0]))
+            else:
+                results.extend(self.tool_pool.map(bind(self._run_tool), batch["calls"]))
+        return results
+
+    def _run_tool(self, call):
+        tool = call.get("tool")
+        params = call.get("parameters") or {}
+        if self.on_progress:
+            self.on_progress(tool, params)
+        with self.tracer.span("tool", tool) as span:
             try:
-                action = json.loads(json_match.group())
-                tool = action.get("tool")
-                params = action.get("parameters", {})
                 result = self.dispatch_tool(tool, params)
-                
-                # Feed result back to AI
-                observation = f"Observation: {result}"
-                self.history.append({"role": "assistant", "content": raw_response})
-                self.history.append({"role": "system", "content": observation})
-                
-                # Recursive call to let AI finish the task
-                return self.run_cycle("Continue based on the observation.")
-            except:
-                pass
-        
-        return raw_response
+            except Exception as e:
+                span.error = type(e).__name__
+                return tool, f"Tool error: {e}"
+            if isinstance(result, dict) and result.get("error"):
+                span.error = "ToolError"
+            span.set(bytes_out=len(str(result)))
+            return tool, result
 
     def dispatch_tool(self, tool, params):
         if tool == "execute_command":
             return self.execute_command(params.get("command"))
         elif tool == "read_file":
-            return self.read_file(params.get("path"))
+            return self.read_file(params.get("path"), params.get("start_line"), params.get("end_line"))
         elif tool == "write_file":
             return self.write_file(params.get("path"), params.get("content"))
         elif tool == "edit_file":
-            return self.edit_file(params.get("path"), params.get("old_text"), params.get("new_text"))
+            return self.edit_file(
+                params.get("path"), params.get("old_text"), params.get("new_text"), params.get("occurrence")
+            )
+        elif tool == "list_files":
+            return self.list_files(params.get("path", "."), params.get("pattern"), params.get("max_depth"))
+        elif tool == "search_code":
+            return self.search_code(
+                params.get("query"), params.get("regex", False), params.get("path"), params.get("max_results", 30)
+            )
         elif tool == "git_op":
-            return self.git_operation(params.get("action"), **params)
+            return self.git_operation(params.get("action"), **{k: v for k, v in params.items() if k != "action"})
+        elif tool == "run_skill":
+            return self.run_skill(params.get("name"), params.get("args") or {})
         elif tool == "browse_web":
-            return self.browse_web(params.get("url"))
+            return self.browse_web(
+                params.get("url"),
+                params.get("render", False),
+                params.get("offset", 0),
+                params.get("length", 4000),
+                params.get("known_hash")
+            )
         return f"Unknown tool: {tool}"
 
-    def execute_command(self, command):
+    def execute_command(self, command, timeout=300):
         console.print(f"[bold blue]>[/bold blue] [dim]{command}[/dim]")
-        try:
-            result = subprocess.run(command, shell=True, cwd=self.workspace_dir, capture_output=True, text=True, timeout=300)
-            return {"stdout": result.stdout, "stderr": result.stderr, "code": result.returncode}
-        except Exception as e:
-            return {"error": str(e)}
+        with self.tracer.span("command") as span:
+            try:
+                result = get_background_loop().run(run_command(
+                    command,
+                    cwd=self.workspace_dir,
+                    timeout=timeout,
+                    on_line=self._on_output_line,
+                    cancel_event=self.cancel_event
+                ))
+            except Exception as e:
+                span.error = type(e).__name__
+                return {"error": str(e)}
+            finally:
+                # Commands change files behind the index's back.
+                self.workspace.mark_stale()
+            span.set(code=result.get("code"), bytes_out=len(result.get("stdout", "")) + len(result.get("stderr", "")))
+            if result.get("error"):
+                span.error = "CommandError"
+            return result
 
-    def read_file(self, path):
-        full_path = os.path.join(self.workspace_dir, path)
+    def _on_output_line(self, stream, line):
+        # Raw writes: rich rendering costs ~1ms per line, too slow for noisy builds.
+        if not console.quiet:
+            console.file.write(line + "\n")
+        if self.on_output:
+            self.on_output(stream, line)
+
+    def read_file(self, path, start_line=None, end_line=None):
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            if start_line is None and end_line is None:
+                size = os.path.getsize(self.workspace.resolve(path))
+                if size <= self.max_read_chars:
+                    return self.workspace.read(path)
+                # Too big to return whole: show the head and say how to page.
+                text, total = self.workspace.read_lines(path, 1, 200)
+                return (f"[{path}: {total} lines, {size} bytes; showing lines 1-200, "
+                        f"pass start_line/end_line for more]\n{text[:self.max_read_chars]}")
+            text, total = self.workspace.read_lines(path, start_line, end_line)
+            end = total if end_line is None else min(int(end_line), total)
+            return f"[{path}: lines {start_line or 1}-{end} of {total}]\n{text}"
         except Exception as e:
             return str(e)
 
     def write_file(self, path, content):
-        full_path = os.path.join(self.workspace_dir, path)
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
         try:
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            self.workspace.write(path, content)
             return f"Wrote to {path}"
         except Exception as e:
             return str(e)
 
-    def edit_file(self, path, old_text, new_text):
-        content = self.read_file(path)
-        if old_text not in content:
-            return "Old text not found."
-        return self.write_file(path, content.replace(old_text, new_text))
+    def edit_file(self, path, old_text, new_text, occurrence=None):
+        try:
+            line = self.workspace.edit(path, old_text, new_text, occurrence)
+            return f"Edited {path} at line {line}"
+        except Exception as e:
+            return str(e)
+
+    def list_files(self, path=".", pattern=None, max_depth=None):
+        try:
+            paths, total = self.workspace.tree(path, pattern, max_depth)
+        except Exception as e:
+            return str(e)
+        more = f"\n... {total - len(paths)} more (narrow with pattern or path)" if total > len(paths) else ""
+        return "\n".join(paths) + more if paths else "No files."
+
+    def search_code(self, query, regex=False, path=None, max_results=30):
+        if not query:
+            return "search_code needs a query."
+        try:
+            found = self.workspace.search_index().search(query, regex=regex, path_glob=path, max_results=int(max_results))
+        except Exception as e:
+            return str(e)
+        if not found["matches"]:
+            return f"No matches for {query!r}."
+        blocks = [f"{m['path']}:{m['line']} ({m['matches_in_file']} in file)\n{m['text']}" for m in found["matches"]]
+        more = "\n... more matches; narrow the query or path" if found["truncated"] else ""
+        return f"{found['files']} files match.\n\n" + "\n\n".join(blocks) + more
 
     def git_operation(self, action, **kwargs):
-        if action == "clone":
-            return self.execute_command(f"git clone {kwargs.get('repo_url')}")
-        elif action == "pull":
-            return self.execute_command("git pull")
-        elif action == "push":
-            self.execute_command("git add .")
-            self.execute_command(f"git commit -m '{kwargs.get('message', 'Melius update')}'")
-            return self.execute_command("git push")
+        git = self.workspace.git()
+        path = kwargs.get("path") or "."
+        try:
+            if action == "clone":
+                return git.clone(
+                    kwargs.get("repo_url"), kwargs.get("path"), kwargs.get("depth", 1),
+                    kwargs.get("partial", False), kwargs.get("branch")
+                )
+            elif action == "status":
+                return git.status(path)
+            elif action == "diff":
+                return git.diff(path, kwargs.get("staged", False), kwargs.get("files"))
+            elif action == "commit":
+                return git.commit(kwargs.get("message", "Melius update"), path, kwargs.get("files"))
+            elif action == "push":
+                if kwargs.get("message"):
+                    committed = git.commit(kwargs["message"], path)
+                    if "error" in committed:
+                        return committed
+                return git.push(path, kwargs.get("remote", "origin"), kwargs.get("branch"))
+            elif action == "pull":
+                return git.pull(path, kwargs.get("remote", "origin"))
+            elif action == "log":
+                return git.log(path, kwargs.get("limit", 10))
+        except Exception as e:
+            return {"error": str(e)}
         return "Invalid git action."
 
-    def browse_web(self, url):
-        # Integrated lightweight browsing logic
+    def skill_manager(self):
+        if self.skills is None:
+            from melius.skills.manager import SkillManager
+            options = dict(self.provider.config.get("skills", {}))
+            options.pop("isolated", None)
+            self.skills = SkillManager(executor_options=options)
+        return self.skills
+
+    def skills_prompt(self):
+        """Installed skills, appended to the tool list so the model knows they exist."""
         try:
-            import requests
-            from bs4 import BeautifulSoup
-            res = requests.get(url, timeout=10)
-            soup = BeautifulSoup(res.text, 'html.parser')
-            return soup.get_text()[:2000] # Return first 2000 chars
+            manager = self.skill_manager()
+            names = manager.registry.names()
+        except Exception:
+            return ""
+        if not names:
+            return ""
+        return "\n\nInstalled skills (use run_skill):\n" + "\n".join(
+            f"- {name}: {manager.registry.describe(name)}" for name in names
+        )
+
+    def run_skill(self, name, args):
+        console.print(f"[bold magenta]skill[/bold magenta] [dim]{name}[/dim]")
+        with self.tracer.span("skill", name) as span:
+            try:
+                manager = self.skill_manager()
+                if self.provider.config.get("skills", {}).get("isolated", True):
+                    result = manager.run_skill_isolated(name, kwargs=args)
+                else:
+                    result = manager.run_skill(name, kwargs=args)
+            except Exception as e:
+                span.error = type(e).__name__
+                return f"Skill error: {str(e)}"
+            if isinstance(result, str) and result.startswith("Error"):
+                span.error = "SkillError"
+            span.set(bytes_out=len(str(result)))
+            return result
+
+    def browse_web(self, url, render=False, offset=0, length=4000, known_hash=None):
+        """Read a page's text through the web cache, one chunk at a time."""
+        with self.tracer.span("browse", "render" if render else "fetch") as span:
+            result = self._browse_web(url, render, offset, length, known_hash)
+            if isinstance(result, dict):
+                span.set(cache_hit=result["source"] in ("hit", "revalidated"), bytes_out=len(result.get("text", "")))
+            else:
+                span.error = "BrowserError"
+            return result
+
+    def _browse_web(self, url, render, offset, length, known_hash):
+        try:
+            from melius.browser.cache import get_web_cache
+
+            cache = get_web_cache(**self.provider.config.get("web_cache", {}))
+            if not render:
+                return cache.read(url, offset, length, known_hash)
+
+            content_hash = cache.fresh_hash("render:" + url)
+            if content_hash:
+                return cache.chunk(url, content_hash, "hit", offset, length, known_hash)
+
+            from melius.browser.engine import get_browser_pool
+
+            pool = get_browser_pool(**self.provider.config.get("browser", {}))
+            title, html, text = get_background_loop().run(pool.fetch(url))
+            content_hash = cache.store("render:" + url, html)
+            cache.text(content_hash, f"{title}\n{text}")
+            return cache.chunk(url, content_hash, "rendered", offset, length, known_hash)
         except Exception as e:
             return f"Browser error: {str(e)}"
@@ -0,0 +1,180 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+FINISHED = ("ok", "stopped", "error")
+
+def load_tasks(path):
+    """Read tasks from a JSONL file; each needs an ``id`` and a ``prompt``."""
+    tasks = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                task = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON ({e})")
+            task_id = str(task.get("id", number))
+            if not task.get("prompt"):
+                raise ValueError(f"{path}:{number}: task {task_id} has no prompt")
+            if task_id in seen:
+                raise ValueError(f"{path}:{number}: duplicate task id {task_id}")
+            seen.add(task_id)
+            task["id"] = task_id
+            tasks.append(task)
+    return tasks
+
+def load_finished(path, retry_failed=False):
+    """Ids already recorded in an output JSONL file (lines cut off by a crash are ignored)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") in FINISHED and not (retry_failed and record["status"] == "error"):
+                done.add(str(record.get("id")))
+    return done
+
+class BatchRunner:
+    """Runs agent tasks concurrently, each in its own workspace directory.
+
+    All agents share one ``ModelProvider``, so the key scheduler spreads the
+    ``concurrency`` in-flight tasks over every configured key. Each finished
+    task is appended to ``output`` right away and fsync'ed. A restarted run
+    skips ids that are already recorded there and starts the others in an
+    emptied workspace.
+    """
+
+    def __init__(self, output, workspaces="melius-runs", concurrency=4, provider=None,
+                 max_steps=25, max_seconds=900, retry_failed=False):
+        from melius.models.provider import ModelProvider
+
+        self.output = output
+        self.workspaces = os.path.abspath(workspaces)
+        self.concurrency = concurrency
+        self.provider = provider or ModelProvider()
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.retry_failed = retry_failed
+        self.skills = None
+        self.running = {}
+        self._lock = threading.Lock()
+
+    def workspace_for(self, task):
+        # Ids become directory names; keep them readable but filesystem-safe.
+        name = re.sub(r'[^A-Za-z0-9._-]+', '_', task["id"]).strip("._") or "task"
+        return os.path.join(self.workspaces, name)
+
+    def reset_workspace(self, path):
+        """Empty a workspace left behind by an earlier, unfinished attempt; True if there was one."""
+        if not os.path.isdir(path) or not os.listdir(path):
+            return False
+        shutil.rmtree(path)
+        return True
+
+    def prepare(self, agent, task):
+        """Populate the task's workspace from ``repo`` (shallow clone) or ``source`` (copy)."""
+        if task.get("repo"):
+            cloned = agent.workspace.git().clone(task["repo"], ".", branch=task.get("branch"))
+            if "error" in cloned:
+                raise RuntimeError(f"clone failed: {cloned['error']}")
+        elif task.get("source"):
+            shutil.copytree(os.path.expanduser(task["source"]), agent.workspace_dir, dirs_exist_ok=True,
+                            ignore=shutil.ignore_patterns(".git"))
+
+    def run_task(self, task):
+        from melius.core.agent import MeliusAgent
+
+        started = time.monotonic()
+        record = {"id": task["id"], "workspace": self.workspace_for(task)}
+        agent = None
+        try:
+            # Unfinished tasks rerun from scratch, not on top of a half-edited tree.
+            if self.reset_workspace(record["workspace"]):
+                record["workspace_reset"] = True
+            agent = MeliusAgent(
+                record["workspace"], provider=self.provider, skills=self.skills,
+                max_steps=task.get("max_steps", self.max_steps),
+                max_seconds=task.get("max_seconds", self.max_seconds)
+            )
+            with self._lock:
+                self.running[task["id"]] = agent
+            self.prepare(agent, task)
+            result = agent.run_cycle(task["prompt"])
+            if agent.cancel_event.is_set():
+                record["status"] = "cancelled"
+            elif agent.last_error:
+                # A failed model call is an error, not an answer; --retry-failed reruns it.
+                record.update(status="error", error=agent.last_error)
+            else:
+                record["status"] = "stopped" if result.startswith("Stopped:") else "ok"
+            record["result"] = result
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self.running.pop(task["id"], None)
+            if agent is not None:
+                agent.tool_pool.shutdown(wait=False)
+        record["seconds"] = round(time.monotonic() - started, 2)
+        return record
+
+    def _write(self, out, record):
+        with self._lock:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+    def cancel(self):
+        with self._lock:
+            for agent in self.running.values():
+                agent.cancel_event.set()
+
+    def run(self, tasks, on_result=None):
+        """Run every unfinished task; returns a dict of counts per status."""
+        finished = load_finished(self.output, self.retry_failed)
+        pending = [task for task in tasks if task["id"] not in finished]
+        counts = {"skipped": len(tasks) - len(pending)}
+        if not pending:
+            return counts
+        os.makedirs(self.workspaces, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(self.output)), exist_ok=True)
+        owns_skills = self.skills is None
+        if owns_skills:
+            from melius.skills.manager import SkillManager
+            options = dict(self.provider.config.get("skills", {}))
+            options.pop("isolated", None)
+            self.skills = SkillManager(executor_options=options)
+
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="melius-batch")
+        with open(self.output, 'a', encoding='utf-8') as out:
+            futures = [pool.submit(self.run_task, task) for task in pending]
+            try:
+                for future in as_completed(futures):
+                    record = future.result()
+                    counts[record["status"]] = counts.get(record["status"], 0) + 1
+                    # Cancelled tasks are not recorded, so the next run retries them.
+                    if record["status"] != "cancelled":
+                        self._write(out, record)
+                    if on_result:
+                        on_result(record)
+            except KeyboardInterrupt:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.cancel()
+                raise
+            finally:
+                pool.shutdown(wait=True)
+                if owns_skills:
+                    self.skills.shutdown()
+                    self.skills = None
+        return counts
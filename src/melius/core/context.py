@@ -0,0 +1,102 @@
+import json
+
+from melius.core.history import estimate_tokens, shorten
+
+# Context windows by model-name prefix; the longest matching prefix wins.
+# ``context.windows`` in config.json adds or overrides entries.
+DEFAULT_WINDOWS = {
+    "anthropic/": 200000,
+    "openai/gpt-4o": 128000,
+    "openai/gpt-4.1": 1000000,
+    "openai/o": 200000,
+    "google/gemini": 1000000,
+    "meta-llama/llama-3": 128000,
+    "mistralai/": 32000,
+    "deepseek/": 64000,
+    "qwen/": 32000,
+}
+
+def context_window(model, windows=None, default=32000):
+    table = dict(DEFAULT_WINDOWS, **(windows or {}))
+    matches = [prefix for prefix in table if model.startswith(prefix)]
+    return table[max(matches, key=len)] if matches else default
+
+class ContextBuilder:
+    """Builds request bodies for one system prompt (and tool list) without re-encoding history.
+
+    The system message and tool schema are encoded once. Each history message
+    is JSON-encoded the first time it is sent and reused while the same dict
+    stays in the history, which only replaces messages when it compacts them.
+    Token counts come from ``ConversationHistory.tokens``, which are computed
+    once on append. ``fit`` drops the oldest turns (keeping the compaction
+    summary) until the request fits ``window - reserve_output`` tokens, so an
+    oversized request never reaches the provider.
+    """
+
+    def __init__(self, system_prompt, tools=None, prompt_caching=False):
+        self.system_prompt = system_prompt
+        self.tools = tools
+        if prompt_caching:
+            # Anthropic-style breakpoint (passed through by OpenRouter): the
+            # static system prompt is billed and processed once per cache TTL.
+            system = {"role": "system", "content": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]}
+        else:
+            system = {"role": "system", "content": system_prompt}
+        self.system_fragment = json.dumps(system)
+        self.tools_fragment = json.dumps(tools) if tools else None
+        self.fixed_tokens = estimate_tokens(system_prompt) + (estimate_tokens(self.tools_fragment) if tools else 0)
+        self._encoded = {}
+
+    def _fragment(self, message):
+        entry = self._encoded.get(id(message))
+        if entry is None or entry[0] is not message:
+            entry = (message, json.dumps({"role": message["role"], "content": message["content"]}))
+            self._encoded[id(message)] = entry
+        return entry[1]
+
+    def fit(self, history, window, reserve_output=4096):
+        """The messages to send, oldest first, and how many were left out."""
+        messages = list(history)
+        tokens = list(getattr(history, "tokens", None) or [estimate_tokens(m["content"]) for m in messages])
+        budget = window - reserve_output - self.fixed_tokens
+        keep_first = bool(messages) and getattr(history, "summarized", False)
+        used = tokens[0] if keep_first else 0
+        start = len(messages)
+        floor = 1 if keep_first else 0
+        while start > floor and used + tokens[start - 1] <= budget:
+            start -= 1
+            used += tokens[start]
+        selected = messages[start:]
+        if not selected and messages:
+            # Even the latest message alone is too big: send a shortened copy.
+            last = messages[-1]
+            selected = [dict(last, content=shorten(last["content"], max(budget - used, 256) * 4))]
+            start = len(messages) - 1
+        if keep_first and start > 0:
+            selected = [messages[0]] + selected
+        omitted = start - floor
+        if len(self._encoded) > 4 * len(messages) + 64:
+            live = {id(m) for m in messages}
+            self._encoded = {k: v for k, v in self._encoded.items() if k in live}
+        return selected, omitted
+
+    def messages_json(self, history, window, reserve_output=4096):
+        """The encoded ``messages`` array, ready to splice into a request body."""
+        selected, omitted = self.fit(history, window, reserve_output)
+        parts = [self.system_fragment]
+        if omitted > 0:
+            parts.append(json.dumps({
+                "role": "system",
+                "content": f"[{omitted} earlier messages omitted to fit the context window]",
+            }))
+        parts.extend(self._fragment(message) for message in selected)
+        return "[" + ",".join(parts) + "]"
+
+    def body(self, fields, history, window, reserve_output=4096):
+        """A complete JSON request body: ``fields`` plus messages (and tools, when set)."""
+        head = json.dumps(fields)[:-1]
+        tools = f',"tools":{self.tools_fragment}' if self.tools_fragment else ""
+        separator = "," if fields else ""
+        return f'{head}{separator}"messages":{self.messages_json(history, window, reserve_output)}{tools}}}'
@@ -0,0 +1,89 @@
+# The user turn the agent adds after each observation. It carries no request
+# of its own, so compaction leaves it out of the summary.
+CONTINUE_PROMPT = "Continue based on the observation."
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for budgeting."""
+    return len(text) // 4 + 1
+
+def shorten(text, limit):
+    """Keep the head and tail of ``text`` so it fits in ``limit`` characters."""
+    if len(text) <= limit:
+        return text
+    half = max(limit // 2 - 40, 0)
+    return f"{text[:half]}\n[... {len(text) - 2 * half} chars elided ...]\n{text[-half:]}"
+
+class ConversationHistory:
+    """Agent message history held under a token budget.
+
+    Observations are capped when appended. When the total goes over
+    ``token_budget``, messages older than the last ``keep_recent`` are first
+    shortened, then dropped and folded into a short summary message.
+    """
+
+    def __init__(self, token_budget=24000, max_observation_chars=12000, compact_chars=800, keep_recent=6):
+        self.token_budget = token_budget
+        self.max_observation_chars = max_observation_chars
+        self.compact_chars = compact_chars
+        self.keep_recent = keep_recent
+        self.messages = []
+        self.tokens = []
+        self.summary = []
+        self.summarized = False
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    @property
+    def total_tokens(self):
+        return sum(self.tokens)
+
+    def append(self, message):
+        if message["role"] != "user":
+            message = dict(message, content=shorten(message["content"], self.max_observation_chars))
+        self.messages.append(message)
+        self.tokens.append(estimate_tokens(message["content"]))
+        if self.total_tokens > self.token_budget:
+            self.compact()
+
+    def clear(self):
+        self.messages.clear()
+        self.tokens.clear()
+        self.summary.clear()
+        self.summarized = False
+
+    def compact(self):
+        old = max(len(self.messages) - self.keep_recent, 0)
+        start = 1 if self.summarized else 0
+        for i in range(start, old):
+            if self.total_tokens <= self.token_budget:
+                return
+            message = self.messages[i]
+            if message["role"] != "user" and len(message["content"]) > self.compact_chars:
+                self.messages[i] = dict(message, content=shorten(message["content"], self.compact_chars))
+                self.tokens[i] = estimate_tokens(self.messages[i]["content"])
+
+        dropped = 0
+        while self.total_tokens > self.token_budget and start + dropped < old:
+            message = self.messages[start + dropped]
+            if message["role"] == "user" and message["content"] != CONTINUE_PROMPT:
+                self.summary.append("- " + shorten(message["content"], 200).replace("\n", " "))
+            dropped += 1
+        if not dropped:
+            return
+        del self.messages[start:start + dropped]
+        del self.tokens[start:start + dropped]
+        self.summary = self.summary[-20:]
+        note = {"role": "system", "content": "Earlier requests in this session (details compacted):\n" + "\n".join(self.summary)}
+        if start:
+            self.messages[0], self.tokens[0] = note, estimate_tokens(note["content"])
+        else:
+            self.messages.insert(0, note)
+            self.tokens.insert(0, estimate_tokens(note["content"]))
+            self.summarized = True
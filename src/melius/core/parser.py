@@ -0,0 +1,148 @@
+import json
+import re
+
+_VALUE_START = re.compile(r'[\[{]')
+_NON_SPACE = re.compile(r'\S')
+_STRUCTURAL = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'["\\]')
+_CLOSERS = {"}": "{", "]": "["}
+
+class ToolCallError:
+    """A tool-call block that could not be decoded, reported back to the model."""
+
+    def __init__(self, message, offset, snippet):
+        self.message = message
+        self.offset = offset
+        self.snippet = snippet
+
+    def to_dict(self):
+        return {"error": self.message, "offset": self.offset, "snippet": self.snippet}
+
+    def __str__(self):
+        return f"{self.message} (at offset {self.offset}): {self.snippet}"
+
+class ToolCallParser:
+    """Incremental extractor for JSON tool calls embedded in model prose.
+
+    Feed it chunks as they stream in. It tracks bracket depth and string
+    state across chunks, so each character is scanned once. A candidate block
+    must open like JSON (``{"`` or ``[{``), which lets stray braces in prose
+    through. The first block that yields tool calls sets ``done``, and the
+    caller can stop reading the stream there. Blocks that mention ``"tool"``
+    but fail to decode are recorded in ``errors``.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.errors = []
+        self.done = False
+        self.offset = 0
+        self._reset()
+
+    def _reset(self):
+        self.start = None
+        self.stack = []
+        self.parts = []
+        self.checking = False
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk):
+        """Consume the next chunk and return any tool calls it completed."""
+        found = len(self.calls)
+        i, n = 0, len(chunk)
+        segment = 0
+        while i < n and not self.done:
+            if self.start is None:
+                match = _VALUE_START.search(chunk, i)
+                if not match:
+                    break
+                self.start = self.offset + match.start()
+                self.stack = [match.group()]
+                self.checking = True
+                segment = match.start()
+                i = match.end()
+            elif self.checking:
+                match = _NON_SPACE.search(chunk, i)
+                if not match:
+                    break
+                char = match.group()
+                if char in ('"}' if self.stack[0] == "{" else "{"):
+                    self.checking = False
+                    i = match.start()
+                else:
+                    self._reset()
+                    i = match.start()
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                    i += 1
+                    continue
+                match = _STRING_END.search(chunk, i)
+                if not match:
+                    break
+                if match.group() == "\\":
+                    self.escape = True
+                    i = match.end()
+                else:
+                    self.in_string = False
+                    i = match.end()
+            else:
+                match = _STRUCTURAL.search(chunk, i)
+                if not match:
+                    break
+                char = match.group()
+                i = match.end()
+                if char == '"':
+                    self.in_string = True
+                elif char in "[{":
+                    self.stack.append(char)
+                elif self.stack[-1] != _CLOSERS[char]:
+                    self.parts.append(chunk[segment:i])
+                    self._fail(f"Mismatched '{char}'")
+                    self._reset()
+                else:
+                    self.stack.pop()
+                    if not self.stack:
+                        self.parts.append(chunk[segment:i])
+                        self._finish("".join(self.parts))
+                        self._reset()
+        if self.start is not None:
+            self.parts.append(chunk[segment:])
+        self.offset += n
+        return self.calls[found:]
+
+    def close(self):
+        """Flush at end of stream; an unterminated tool-call block becomes an error."""
+        if self.start is not None and not self.checking:
+            self._fail("Unterminated JSON block")
+        self._reset()
+        return self.calls
+
+    def _finish(self, text):
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            if '"tool"' in text:
+                self.errors.append(ToolCallError(e.msg, self.start + e.pos, _snippet(text, e.pos)))
+            return
+        calls = value if isinstance(value, list) else [value]
+        calls = [call for call in calls if isinstance(call, dict) and "tool" in call]
+        if calls:
+            self.calls.extend(calls)
+            self.done = True
+
+    def _fail(self, message):
+        text = "".join(self.parts)
+        if '"tool"' in text:
+            self.errors.append(ToolCallError(message, self.start + len(text), _snippet(text, len(text))))
+
+def _snippet(text, position, width=80):
+    return text[max(position - width, 0):position + width]
+
+def parse_tool_calls(text):
+    """Parse a complete response; returns ``(calls, errors)``."""
+    parser = ToolCallParser()
+    parser.feed(text)
+    parser.close()
+    return parser.calls, parser.errors
@@ -0,0 +1,123 @@
+import asyncio
+import collections
+import os
+import signal
+
+class OutputBuffer:
+    """Keeps the first ``head_chars`` and last ``tail_chars`` of a stream in constant memory."""
+
+    def __init__(self, head_chars=8000, tail_chars=16000):
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.head = []
+        self.head_size = 0
+        self.tail = collections.deque()
+        self.tail_size = 0
+        self.dropped = 0
+
+    def write(self, text):
+        if self.head_size < self.head_chars:
+            part = text[:self.head_chars - self.head_size]
+            self.head.append(part)
+            self.head_size += len(part)
+            text = text[len(part):]
+        if not text:
+            return
+        if len(text) > self.tail_chars:
+            self.dropped += len(text) - self.tail_chars
+            text = text[-self.tail_chars:]
+        self.tail.append(text)
+        self.tail_size += len(text)
+        while self.tail_size - len(self.tail[0]) >= self.tail_chars:
+            removed = self.tail.popleft()
+            self.tail_size -= len(removed)
+            self.dropped += len(removed)
+
+    def getvalue(self):
+        head = "".join(self.head)
+        tail = "".join(self.tail)
+        dropped = self.dropped + max(len(tail) - self.tail_chars, 0)
+        tail = tail[-self.tail_chars:]
+        if dropped:
+            return f"{head}\n[... {dropped} chars omitted ...]\n{tail}"
+        return head + tail
+
+def _kill_group(proc, sig):
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, sig)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+async def _pump(reader, buffer, on_line, stream_name, max_line=65536):
+    pending = ""
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        text = pending + data.decode("utf-8", errors="replace")
+        buffer.write(text[len(pending):])
+        *lines, pending = text.split("\n")
+        if len(pending) > max_line:
+            lines.append(pending)
+            pending = ""
+        if on_line:
+            for line in lines:
+                on_line(stream_name, line)
+    if pending and on_line:
+        on_line(stream_name, pending)
+
+async def run_command(command, cwd=None, timeout=300, on_line=None, cancel_event=None,
+                      head_chars=8000, tail_chars=16000, kill_grace=3):
+    """Run a shell command, streaming output lines to ``on_line(stream, line)``.
+
+    Only the head and tail of stdout/stderr are kept. On timeout or when
+    ``cancel_event`` (a ``threading.Event``) is set, the whole process group
+    gets SIGTERM, then SIGKILL after ``kill_grace`` seconds.
+    """
+    proc = await asyncio.create_subprocess_shell(
+        command, cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        stdin=asyncio.subprocess.DEVNULL,
+        start_new_session=True
+    )
+    stdout, stderr = OutputBuffer(head_chars, tail_chars), OutputBuffer(head_chars // 2, tail_chars // 2)
+    pumps = asyncio.gather(
+        _pump(proc.stdout, stdout, on_line, "stdout"),
+        _pump(proc.stderr, stderr, on_line, "stderr")
+    )
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    stopped = None
+    while proc.returncode is None:
+        try:
+            await asyncio.wait_for(asyncio.shield(proc.wait()), timeout=0.2)
+        except asyncio.TimeoutError:
+            pass
+        if proc.returncode is not None:
+            break
+        if cancel_event is not None and cancel_event.is_set():
+            stopped = "cancelled"
+        elif loop.time() > deadline:
+            stopped = f"timed out after {timeout}s"
+        if stopped:
+            _kill_group(proc, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=kill_grace)
+            except asyncio.TimeoutError:
+                _kill_group(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+                await proc.wait()
+            break
+    try:
+        # Orphaned grandchildren may keep the pipes open; don't wait on them forever.
+        await asyncio.wait_for(pumps, timeout=kill_grace)
+    except asyncio.TimeoutError:
+        pass
+
+    result = {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": proc.returncode}
+    if stopped:
+        result["error"] = f"Command {stopped}."
+    return result
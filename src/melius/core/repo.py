@@ -0,0 +1,266 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import git
+
+class GitWorkspace:
+    """Git operations on repositories inside a ``WorkspaceIndex``, without a shell.
+
+    ``Repo`` handles and their parsed index are cached per repository. The index
+    is re-read only when ``.git/index`` changes on disk. ``commit`` stages just
+    the paths that the workspace index saw change, instead of ``git add .``,
+    and writes the commit in-process. Pushes run on a background thread, and
+    their outcome shows up in ``status``.
+    """
+
+    def __init__(self, workspace, max_diff_chars=20000, max_status_entries=200):
+        self.workspace = workspace
+        self.max_diff_chars = max_diff_chars
+        self.max_status_entries = max_status_entries
+        self.repos = {}
+        self.indexes = {}
+        self.pushes = {}
+        self.push_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="melius-git-push")
+        self._lock = threading.RLock()
+
+    def repo(self, path="."):
+        """Cached ``Repo`` containing ``path``; it must live inside the workspace."""
+        full_path = self.workspace.resolve(path)
+        with self._lock:
+            # Longest root first, so a repo nested in another one wins.
+            for root, repo in sorted(self.repos.items(), key=lambda item: -len(item[0])):
+                if full_path == root or full_path.startswith(root + os.sep):
+                    return repo
+            try:
+                repo = git.Repo(full_path, search_parent_directories=True)
+            except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+                raise ValueError(f"Not a git repository: {path}")
+            root = os.path.realpath(repo.working_tree_dir)
+            if root != self.workspace.root and not root.startswith(self.workspace.root + os.sep):
+                repo.close()
+                raise ValueError(f"Not a git repository inside the workspace: {path}")
+            self.repos[root] = repo
+            return repo
+
+    def _root(self, repo):
+        return os.path.realpath(repo.working_tree_dir)
+
+    def _index(self, repo):
+        root = self._root(repo)
+        index_path = os.path.join(repo.git_dir, "index")
+        try:
+            stamp = os.stat(index_path).st_mtime_ns
+        except OSError:
+            stamp = None
+        cached = self.indexes.get(root)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, git.IndexFile(repo))
+            self.indexes[root] = cached
+        return cached[1]
+
+    def _remember_index(self, repo, index):
+        try:
+            self.indexes[self._root(repo)] = (os.stat(os.path.join(repo.git_dir, "index")).st_mtime_ns, index)
+        except OSError:
+            self.indexes.pop(self._root(repo), None)
+
+    def _prefix(self, repo):
+        prefix = self.workspace.relative(self._root(repo))
+        return "" if prefix == "." else prefix
+
+    def clone(self, url, path=None, depth=1, partial=False, branch=None):
+        """Shallow (``depth``) or partial (``--filter=blob:none``) clone into the workspace."""
+        if not url:
+            return {"error": "clone needs a repo_url."}
+        name = path or os.path.basename(url.rstrip("/"))
+        name = name[:-4] if name.endswith(".git") else name
+        full_path = self.workspace.resolve(name)
+        if os.path.exists(full_path) and os.listdir(full_path):
+            return {"error": f"Destination already exists and is not empty: {name}"}
+        options = {"single_branch": True}
+        if branch:
+            options["branch"] = branch
+        if partial:
+            options["multi_options"] = ["--filter=blob:none"]
+        elif depth:
+            options["depth"] = int(depth)
+        try:
+            repo = git.Repo.clone_from(url, full_path, **options)
+        except git.GitCommandError as e:
+            return {"error": (e.stderr or str(e)).strip()}
+        with self._lock:
+            self.repos[os.path.realpath(full_path)] = repo
+        # The checkout is already committed; don't let it show up as "changed".
+        self.workspace.mark_stale()
+        self.workspace.consume_changes(self._prefix(repo))
+        return {"path": name, "head": repo.head.commit.hexsha[:12], "branch": self._branch(repo)}
+
+    def _branch(self, repo):
+        try:
+            return repo.active_branch.name
+        except TypeError:
+            return None  # detached HEAD
+
+    def status(self, path="."):
+        try:
+            repo = self.repo(path)
+        except ValueError as e:
+            return {"error": str(e)}
+        output = repo.git.status("--porcelain=v1", "--branch", "-z")
+        result = {"branch": self._branch(repo), "tracking": None, "ahead": 0, "behind": 0,
+                  "staged": [], "unstaged": [], "untracked": [], "conflicts": []}
+        items = output.split("\0")
+        i = 0
+        while i < len(items):
+            item = items[i]
+            i += 1
+            if not item:
+                continue
+            if item.startswith("## "):
+                header = item[3:]
+                if "..." in header:
+                    header, _, tracking = header.partition("...")
+                    tracking, _, counts = tracking.partition(" ")
+                    result["tracking"] = tracking
+                    for part in counts.strip("[]").split(", "):
+                        key, _, number = part.partition(" ")
+                        if key in ("ahead", "behind") and number.isdigit():
+                            result[key] = int(number)
+                continue
+            code, name = item[:2], item[3:]
+            if code[0] in "RC":
+                name = f"{items[i]} -> {name}"
+                i += 1
+            if code == "??":
+                result["untracked"].append(name)
+            elif "U" in code or code in ("AA", "DD"):
+                result["conflicts"].append(name)
+            else:
+                if code[0] != " ":
+                    result["staged"].append(f"{code[0]} {name}")
+                if code[1] != " ":
+                    result["unstaged"].append(f"{code[1]} {name}")
+        for key in ("staged", "unstaged", "untracked", "conflicts"):
+            if len(result[key]) > self.max_status_entries:
+                result[f"{key}_total"] = len(result[key])
+                result[key] = result[key][:self.max_status_entries]
+        push = self.pushes.get(self._root(repo))
+        if push is not None:
+            result["last_push"] = push.result() if push.done() else "in progress"
+        return result
+
+    def diff(self, path=".", staged=False, files=None):
+        """Changed files with line counts, plus the patch (truncated to ``max_diff_chars``)."""
+        try:
+            repo = self.repo(path)
+        except ValueError as e:
+            return {"error": str(e)}
+        args = ["--cached"] if staged else []
+        paths = ["--", *files] if files else []
+        stats = []
+        for line in repo.git.diff(*args, "--numstat", *paths).splitlines():
+            added, removed, name = line.split("\t", 2)
+            stats.append({"path": name, "added": added, "removed": removed})
+        patch = repo.git.diff(*args, *paths)
+        truncated = len(patch) > self.max_diff_chars
+        return {"files": stats, "patch": patch[:self.max_diff_chars], "truncated": truncated}
+
+    def commit(self, message, path=".", files=None):
+        """Stage the workspace's changed paths (or ``files``) in this repo and commit them."""
+        if not message:
+            return {"error": "commit needs a message."}
+        try:
+            repo = self.repo(path)
+        except ValueError as e:
+            return {"error": str(e)}
+        prefix = self._prefix(repo)
+        root = self._root(repo)
+        with self._lock:
+            consumed = []
+            if files:
+                changed = [os.path.relpath(self.workspace.resolve(f), root).replace(os.sep, "/") for f in files]
+            else:
+                cut = len(prefix) + 1 if prefix else 0
+                consumed = self.workspace.consume_changes(prefix)
+                changed = [rel[cut:] for rel in consumed]
+            settled = False
+            try:
+                index = self._index(repo)
+                present = [p for p in changed if os.path.lexists(os.path.join(root, p))]
+                gone = [p for p in changed if p not in present and (p, 0) in index.entries]
+                if present:
+                    index.add(present)
+                if gone:
+                    index.remove(gone, working_tree=False)
+                    index = git.IndexFile(repo)
+                tree = index.write_tree()
+                if repo.head.is_valid() and tree.hexsha == repo.head.commit.tree.hexsha:
+                    settled = True  # nothing left to record; don't bring the paths back
+                    self._remember_index(repo, index)
+                    return {"committed": False, "reason": "Nothing to commit.", "staged": len(changed)}
+                commit = index.commit(message)
+                settled = True
+            except (git.GitError, OSError) as e:
+                return {"error": (getattr(e, "stderr", "") or str(e)).strip()}
+            finally:
+                if not settled:
+                    # The commit failed (hook, index.lock, ...): the next one must still see these paths.
+                    self.workspace.restore_changes(consumed)
+            self._remember_index(repo, index)
+        return {"committed": True, "commit": commit.hexsha[:12], "files": present + gone}
+
+    def _push(self, repo, remote, branch):
+        try:
+            infos = repo.remote(remote).push(branch or self._branch(repo) or "HEAD")
+            errors = [info.summary.strip() for info in infos if info.flags & info.ERROR]
+            if errors:
+                return {"ok": False, "error": "; ".join(errors)}
+            return {"ok": True, "summary": "; ".join(info.summary.strip() for info in infos)}
+        except (git.GitCommandError, ValueError) as e:
+            return {"ok": False, "error": (getattr(e, "stderr", "") or str(e)).strip()}
+
+    def push(self, path=".", remote="origin", branch=None, wait=False):
+        """Push on the background thread; ``status`` reports the result as ``last_push``."""
+        try:
+            repo = self.repo(path)
+        except ValueError as e:
+            return {"error": str(e)}
+        future = self.push_pool.submit(self._push, repo, remote, branch)
+        self.pushes[self._root(repo)] = future
+        if wait:
+            return future.result()
+        return {"started": True, "remote": remote, "branch": branch or self._branch(repo)}
+
+    def pull(self, path=".", remote="origin"):
+        try:
+            repo = self.repo(path)
+            infos = repo.remote(remote).pull()
+        except ValueError as e:
+            return {"error": str(e)}
+        except git.GitCommandError as e:
+            return {"error": (e.stderr or str(e)).strip()}
+        # Pulled files will show up as changed; commit() skips them when the tree matches HEAD.
+        self.workspace.mark_stale()
+        return {"head": repo.head.commit.hexsha[:12], "updated": [info.ref.name for info in infos]}
+
+    def log(self, path=".", limit=10):
+        try:
+            repo = self.repo(path)
+        except ValueError as e:
+            return {"error": str(e)}
+        if not repo.head.is_valid():
+            return {"commits": []}
+        return {"commits": [
+            {"commit": c.hexsha[:12], "author": c.author.name, "date": c.committed_datetime.isoformat(),
+             "message": c.summary}
+            for c in repo.iter_commits(max_count=int(limit))
+        ]}
+
+    def close(self):
+        self.push_pool.shutdown(wait=True)
+        with self._lock:
+            for repo in self.repos.values():
+                repo.close()
+            self.repos.clear()
+            self.indexes.clear()
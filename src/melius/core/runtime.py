@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+class BackgroundLoop:
+    """An asyncio loop running in a daemon thread, shared by sync callers."""
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self.loop is None or not self.thread.is_alive():
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever, name="melius-loop", daemon=True)
+                self.thread.start()
+        return self.loop
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the background loop and wait for its result."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.ensure_started())
+        return future.result(timeout)
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.ensure_started())
+
+    def iterate(self, agen):
+        """Drive an async generator from synchronous code, one item at a time."""
+        loop = self.ensure_started()
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Closing early (e.g. the consumer found what it needed) must
+            # release the underlying HTTP response or subprocess.
+            asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+_background = BackgroundLoop()
+
+def get_background_loop():
+    return _background
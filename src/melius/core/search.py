@@ -0,0 +1,212 @@
+import fnmatch
+import re
+import threading
+from array import array
+
+_WORD = re.compile(r'\w{3,}')
+_RUN = re.compile(r'\w+')
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class CodeSearchIndex:
+    """Incremental inverted index for fast literal code search over a workspace.
+
+    Each file is indexed by its lowercase identifier-like tokens (``\\w{3,}``).
+    The token vocabulary has its own trigram index. A query is split into
+    word runs, and each run selects tokens that are equal to it, start or end
+    with it, or contain it, depending on whether the run touches the edge of
+    the query. Candidate files are the intersection over all runs. Only those
+    files are read and scanned for the exact match, so most queries touch a
+    handful of files even in very large trees.
+
+    The index follows the ``WorkspaceIndex`` (and therefore .gitignore) through
+    its change notifications: writes made through the workspace are picked up
+    on the next search, and the tree is re-walked at most every ``max_age``
+    seconds or after ``WorkspaceIndex.mark_stale``. Regex queries can't be
+    narrowed and scan every indexed file that matches ``path_glob``. At most
+    ``max_scan`` files are read per query.
+    """
+
+    def __init__(self, workspace, max_file_bytes=1024 * 1024, max_age=10.0, max_scan=1000):
+        self.workspace = workspace
+        self.max_file_bytes = max_file_bytes
+        self.max_age = max_age
+        self.max_scan = max_scan
+        self.vocabulary = {}
+        self.tokens = []
+        self.postings = []
+        self.vocab_trigrams = {}
+        self.file_ids = {}
+        self.paths = []
+        self.file_tokens = []
+        self.versions = {}
+        self.free_ids = []
+        self.pending = None  # None until the first full build
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+        workspace.subscribe(self._on_change)
+
+    def _on_change(self, changed, removed):
+        with self._pending_lock:
+            if self.pending is not None:
+                self.pending.update(changed, removed)
+
+    def _token_id(self, token):
+        token_id = self.vocabulary.get(token)
+        if token_id is None:
+            token_id = self.vocabulary[token] = len(self.tokens)
+            self.tokens.append(token)
+            self.postings.append(set())
+            for trigram in _trigrams(token):
+                self.vocab_trigrams.setdefault(trigram, set()).add(token_id)
+        return token_id
+
+    def _drop(self, path):
+        file_id = self.file_ids.pop(path, None)
+        self.versions.pop(path, None)
+        if file_id is None:
+            return
+        for token_id in self.file_tokens[file_id]:
+            self.postings[token_id].discard(file_id)
+        self.file_tokens[file_id] = array("I")
+        self.paths[file_id] = None
+        self.free_ids.append(file_id)
+
+    def _add(self, path, entry):
+        self._drop(path)
+        self.versions[path] = (entry.size, entry.mtime_ns)
+        if entry.size > self.max_file_bytes:
+            return
+        try:
+            with open(self.workspace.resolve(path), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        if b"\0" in data[:8192]:
+            return
+        text = data.decode("utf-8", errors="replace").lower()
+        file_id = self.free_ids.pop() if self.free_ids else len(self.paths)
+        if file_id == len(self.paths):
+            self.paths.append(path)
+            self.file_tokens.append(array("I"))
+        self.paths[file_id] = path
+        self.file_ids[path] = file_id
+        token_ids = array("I", (self._token_id(token) for token in set(_WORD.findall(text))))
+        for token_id in token_ids:
+            self.postings[token_id].add(file_id)
+        self.file_tokens[file_id] = token_ids
+
+    def update(self):
+        """Bring the index in line with the workspace; returns the number of files re-indexed."""
+        self.workspace.refresh(max_age=self.max_age)
+        with self._pending_lock:
+            pending, self.pending = self.pending, set()
+        with self.workspace._lock:
+            if pending is None:
+                pending = set(self.workspace.entries) | set(self.versions)
+            entries = {path: self.workspace.entries.get(path) for path in pending}
+        changed = 0
+        for path, entry in entries.items():
+            if entry is None:
+                self._drop(path)
+            elif self.versions.get(path) != (entry.size, entry.mtime_ns):
+                self._add(path, entry)
+                changed += 1
+        return changed
+
+    def _run_tokens(self, run, left_open, right_open):
+        if not left_open and not right_open:
+            token_id = self.vocabulary.get(run)
+            return {token_id} if token_id is not None else set()
+        # Smallest posting first keeps every intersection cheap.
+        sets = sorted((self.vocab_trigrams.get(t, set()) for t in _trigrams(run)), key=len)
+        candidates = sets[0]
+        for ids in sets[1:]:
+            candidates = candidates & ids
+            if not candidates:
+                return set()
+        if left_open and right_open:
+            return {t for t in candidates if run in self.tokens[t]}
+        if left_open:
+            return {t for t in candidates if self.tokens[t].endswith(run)}
+        return {t for t in candidates if self.tokens[t].startswith(run)}
+
+    def candidates(self, query):
+        """File ids that may contain ``query`` (case-insensitive), or None if it can't be narrowed."""
+        query = query.lower()
+        result = None
+        for match in _RUN.finditer(query):
+            run = match.group()
+            left_open = match.start() == 0
+            right_open = match.end() == len(query)
+            if len(run) < 3:
+                continue  # shorter than any indexed token
+            token_ids = self._run_tokens(run, left_open, right_open)
+            files = set()
+            for token_id in token_ids:
+                files |= self.postings[token_id]
+            result = files if result is None else result & files
+            if not result:
+                return set()
+        return result
+
+    def search(self, query, regex=False, path_glob=None, case_sensitive=False, max_results=30,
+               context=2, max_per_file=5):
+        """Ranked matches: ``{"path", "line", "text", "score"}`` with ``context`` lines around each hit."""
+        with self._lock:
+            self.update()
+            flags = 0 if case_sensitive else re.IGNORECASE
+            pattern = re.compile(query if regex else re.escape(query), flags)
+            file_ids = None if regex else self.candidates(query)
+            if file_ids is None:
+                paths = [p for p in self.paths if p is not None]
+            else:
+                paths = [self.paths[i] for i in file_ids]
+        if path_glob:
+            paths = [p for p in paths if fnmatch.fnmatch(p, path_glob) or fnmatch.fnmatch(p.rsplit("/", 1)[-1], path_glob)]
+        needle = query.lower()
+        capped = len(paths) > self.max_scan
+        if capped:
+            # Too broad to read everything: prefer files whose path mentions the query.
+            paths.sort(key=lambda p: (needle not in p.lower(), p))
+            paths = paths[:self.max_scan]
+
+        results = []
+        for path in paths:
+            try:
+                text = self.workspace.read(path)
+            except (OSError, ValueError):
+                continue
+            hits = list(pattern.finditer(text))
+            if not hits:
+                continue
+            lines = text.splitlines()
+            score = len(hits) + (5 if not regex and needle in path.lower() else 0)
+            score += sum(1 for hit in hits if hit.group() == query)  # exact-case bonus
+            shown = []
+            for hit in hits[:max_per_file]:
+                line = text.count("\n", 0, hit.start())
+                if shown and line <= shown[-1]["line"] - 1 + context:
+                    continue
+                start = max(line - context, 0)
+                snippet = "\n".join(
+                    f"{n + 1}{':' if n == line else '-'} {lines[n]}" for n in range(start, min(line + context + 1, len(lines)))
+                )
+                shown.append({"path": path, "line": line + 1, "text": snippet})
+            results.append((score, path, shown, len(hits)))
+
+        results.sort(key=lambda r: (-r[0], r[1]))
+        matches = []
+        for score, path, shown, count in results:
+            for item in shown:
+                if len(matches) >= max_results:
+                    break
+                item["score"] = score
+                item["matches_in_file"] = count
+                matches.append(item)
+        return {
+            "matches": matches,
+            "files": len(results),
+            "truncated": capped or len(matches) >= max_results,
+        }
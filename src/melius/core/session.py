@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+class SessionStore:
+    """LRU/TTL cache of per-chat (or per-user) agents built by ``factory(key)``."""
+
+    def __init__(self, factory, max_sessions=32, idle_ttl=3600):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            if key in self.sessions:
+                agent, _ = self.sessions.pop(key)
+            else:
+                agent = self.factory(key)
+            self.sessions[key] = (agent, now)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+            return agent
+
+    def peek(self, key):
+        """Return the session for ``key`` without creating or touching it."""
+        with self._lock:
+            entry = self.sessions.get(key)
+            return entry[0] if entry else None
+
+    def drop(self, key):
+        with self._lock:
+            return self.sessions.pop(key, (None, None))[0]
+
+    def evict_idle(self):
+        with self._lock:
+            return self._evict_idle(time.monotonic())
+
+    def _evict_idle(self, now):
+        expired = [key for key, (_, used) in self.sessions.items() if now - used > self.idle_ttl]
+        for key in expired:
+            del self.sessions[key]
+        return len(expired)
+
+    def __contains__(self, key):
+        return key in self.sessions
+
+    def __len__(self):
+        return len(self.sessions)
@@ -0,0 +1,259 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current = contextvars.ContextVar("melius_span", default=None)
+
+class Span:
+    __slots__ = ("name", "label", "trace_id", "span_id", "parent_id", "start", "started", "attrs", "error")
+
+    def __init__(self, name, label, parent, attrs):
+        self.name = name
+        self.label = label
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.attrs = attrs
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, amount):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+class StageMetrics:
+    __slots__ = ("count", "errors", "seconds", "buckets", "bytes", "prompt_tokens", "completion_tokens",
+                 "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.bytes = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def observe(self, duration, span):
+        self.count += 1
+        self.seconds += duration
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+        if span.error:
+            self.errors += 1
+        attrs = span.attrs
+        self.bytes += attrs.get("bytes_in", 0) + attrs.get("bytes_out", 0)
+        self.prompt_tokens += attrs.get("prompt_tokens", 0)
+        self.completion_tokens += attrs.get("completion_tokens", 0)
+        if attrs.get("cache_hit") is True:
+            self.cache_hits += 1
+        elif attrs.get("cache_hit") is False:
+            self.cache_misses += 1
+
+class Tracer:
+    """Records spans for model, tool and skill calls.
+
+    Each finished span is appended as one JSON line to a daily file in
+    ``directory`` (read back by ``melius stats``) and folded into in-memory
+    per-stage counters and latency histograms for the Prometheus endpoint.
+    Token counts are estimates (~4 chars per token), like the rest of melius.
+    """
+
+    def __init__(self, enabled=True, directory="~/.melius/traces", retention_days=7):
+        self.enabled = enabled
+        self.directory = os.path.expanduser(directory)
+        self.retention_days = retention_days
+        self.metrics = {}
+        self._file = None
+        self._file_day = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, label=None, **attrs):
+        """Time the block as a child of the current span."""
+        span = self.start(name, label, **attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            self.finish(span)
+
+    def start(self, name, label=None, **attrs):
+        """Open a span without making it current (for generators and callbacks)."""
+        return Span(name, label, _current.get(), attrs)
+
+    def finish(self, span):
+        duration = time.perf_counter() - span.started
+        with self._lock:
+            key = (span.name, span.label)
+            metrics = self.metrics.get(key)
+            if metrics is None:
+                metrics = self.metrics[key] = StageMetrics()
+            metrics.observe(duration, span)
+            if self.enabled:
+                self._write({
+                    "ts": round(span.start, 3), "trace": span.trace_id, "span": span.span_id,
+                    "parent": span.parent_id, "name": span.name, "label": span.label,
+                    "ms": round(duration * 1000, 3), "error": span.error, **span.attrs,
+                })
+
+    def _write(self, record):
+        day = time.strftime("%Y%m%d", time.localtime(record["ts"]))
+        try:
+            if day != self._file_day:
+                if self._file:
+                    self._file.close()
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(os.path.join(self.directory, f"trace-{day}.jsonl"), 'a', encoding='utf-8')
+                self._file_day = day
+                self._prune()
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+        except OSError:
+            pass  # Tracing must never break the agent.
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_days * 86400
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("trace-") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self.metrics.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+            lines = [
+                "# HELP melius_span_seconds Duration of agent stages.",
+                "# TYPE melius_span_seconds histogram",
+            ]
+            for (name, label), m in items:
+                labels = _labels(name, label)
+                for bound, count in zip(BUCKETS, m.buckets):
+                    lines.append(f'melius_span_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'melius_span_seconds_bucket{{{labels},le="+Inf"}} {m.count}')
+                lines.append(f"melius_span_seconds_sum{{{labels}}} {m.seconds:.6f}")
+                lines.append(f"melius_span_seconds_count{{{labels}}} {m.count}")
+            counters = (
+                ("melius_span_errors_total", "Spans that failed.", "errors"),
+                ("melius_payload_bytes_total", "Payload bytes sent and received.", "bytes"),
+                ("melius_prompt_tokens_total", "Estimated prompt tokens.", "prompt_tokens"),
+                ("melius_completion_tokens_total", "Estimated completion tokens.", "completion_tokens"),
+                ("melius_cache_hits_total", "Cache hits.", "cache_hits"),
+                ("melius_cache_misses_total", "Cache misses.", "cache_misses"),
+            )
+            for metric, help_text, attr in counters:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for (name, label), m in items:
+                    lines.append(f"{metric}{{{_labels(name, label)}}} {getattr(m, attr)}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+                self._file_day = None
+
+def _labels(name, label):
+    label = (label or "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+    return f'stage="{name}",label="{label}"'
+
+def bind(fn):
+    """Wrap ``fn`` so it runs under the caller's current span on another thread."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+_tracer = None
+
+def get_tracer(**options):
+    """Return the process-wide tracer; ``options`` only apply on first use."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(**options)
+    return _tracer
+
+def serve_metrics(host="127.0.0.1", port=9464):
+    """Serve ``/metrics`` from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = get_tracer().prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="melius-metrics", daemon=True).start()
+    return server
+
+def load_spans(directory="~/.melius/traces", since=None):
+    """Yield span records from the trace files, optionally only those after ``since`` (epoch seconds)."""
+    directory = os.path.expanduser(directory)
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("trace-") and name.endswith(".jsonl")):
+            continue
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or record.get("ts", 0) >= since:
+                    yield record
+
+def summarize(records, by_label=False):
+    """Per-stage count, p50/p95/max latency, error count, tokens, bytes and cache hit rate."""
+    groups = {}
+    for record in records:
+        key = (record.get("name"), record.get("label") if by_label else None)
+        groups.setdefault(key, []).append(record)
+    rows = []
+    for (name, label), spans in sorted(groups.items(), key=lambda item: (item[0][0] or "", item[0][1] or "")):
+        durations = sorted(span.get("ms", 0) for span in spans)
+        hits = [span["cache_hit"] for span in spans if span.get("cache_hit") is not None]
+        rows.append({
+            "stage": name if label is None else f"{name}:{label}",
+            "count": len(spans),
+            "p50_ms": _percentile(durations, 0.50),
+            "p95_ms": _percentile(durations, 0.95),
+            "max_ms": round(durations[-1], 1),
+            "total_s": round(sum(durations) / 1000, 2),
+            "errors": sum(1 for span in spans if span.get("error")),
+            "tokens": sum(span.get("prompt_tokens", 0) + span.get("completion_tokens", 0) for span in spans),
+            "bytes": sum(span.get("bytes_in", 0) + span.get("bytes_out", 0) for span in spans),
+            "cache_hit_rate": round(sum(hits) / len(hits), 3) if hits else None,
+        })
+    return rows
+
+def _percentile(values, fraction):
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return round(values[index], 1)
@@ -0,0 +1,417 @@
+import fnmatch
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from array import array
+
+ALWAYS_IGNORED = {".git", "__pycache__", ".hg", ".svn", ".mypy_cache", ".pytest_cache", ".ruff_cache"}
+
+class IgnoreRules:
+    """A pragmatic .gitignore matcher: globs, ``/``-anchoring, ``dir/`` and ``!`` negation."""
+
+    def __init__(self, root):
+        self.root = root
+        self.rules = {}
+        self.generation = 0
+        self._stats = {}
+        self._checked = set()
+
+    def begin_scan(self):
+        """Re-check .gitignore files for changes on the next lookup of each directory."""
+        self._checked.clear()
+
+    def check(self, directory):
+        """Pick up changes to ``directory``'s .gitignore; returns the rules ``generation``.
+
+        The generation goes up whenever any .gitignore appears, changes or goes away.
+        """
+        self._load(directory)
+        return self.generation
+
+    def _load(self, directory):
+        if directory in self._checked:
+            return self.rules.get(directory, [])
+        self._checked.add(directory)
+        path = os.path.join(self.root, directory, ".gitignore")
+        try:
+            st = os.stat(path)
+        except OSError:
+            if self.rules.pop(directory, None) is not None:
+                self.generation += 1
+            self._stats.pop(directory, None)
+            return []
+        if self._stats.get(directory) != st.st_mtime_ns:
+            rules = []
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if not line.strip() or line.startswith("#"):
+                        continue
+                    negate = line.startswith("!")
+                    pattern = line[1:] if negate else line
+                    dir_only = pattern.endswith("/")
+                    pattern = pattern.strip("/") if dir_only else pattern
+                    anchored = "/" in pattern.lstrip("/") or pattern.startswith("/")
+                    rules.append((pattern.lstrip("/"), negate, dir_only, anchored))
+            self.rules[directory] = rules
+            self._stats[directory] = st.st_mtime_ns
+            self.generation += 1
+        return self.rules[directory]
+
+    def ignored(self, rel_path, is_dir):
+        name = os.path.basename(rel_path)
+        if name in ALWAYS_IGNORED:
+            return True
+        result = False
+        parts = rel_path.split("/")
+        for depth in range(len(parts)):
+            base = "/".join(parts[:depth])
+            local = "/".join(parts[depth:])
+            for pattern, negate, dir_only, anchored in self._load(base):
+                if dir_only and not is_dir:
+                    continue
+                target = local if anchored else name
+                if fnmatch.fnmatchcase(target, pattern) or fnmatch.fnmatchcase(target, pattern.replace("**/", "")):
+                    result = not negate
+        return result
+
+class FileEntry:
+    __slots__ = ("size", "mtime_ns", "digest", "line_offsets")
+
+    def __init__(self, size, mtime_ns):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = None
+        self.line_offsets = None
+
+class WorkspaceIndex:
+    """Path/size/mtime/hash index of a workspace, kept current by stat diffing.
+
+    ``refresh`` walks the tree (skipping ignored directories) and only
+    updates entries whose size or mtime changed. A directory whose mtime (and
+    the .gitignore rules over it) haven't changed since the last walk reuses
+    its cached listing, so a rescan is one ``stat`` per file, with no
+    ``readdir`` and no ignore matching for unchanged directories. ``mark_stale`` starts that rescan on a background
+    thread, so it is usually done before the next search. Hashes and line-offset
+    tables are computed lazily and dropped when a file changes. Files larger
+    than ``mmap_threshold`` are read through ``mmap``, so a slice of a
+    multi-MB file never loads the whole file.
+    """
+
+    def __init__(self, root, mmap_threshold=1024 * 1024, refresh_interval=1.0):
+        self.root = os.path.realpath(root)
+        self.mmap_threshold = mmap_threshold
+        self.refresh_interval = refresh_interval
+        self.ignore = IgnoreRules(self.root)
+        self.entries = {}
+        self.dirs = {}
+        self.changed = set()
+        self._last_refresh = None
+        self._background = None
+        self._background_pending = False
+        self._background_lock = threading.Lock()
+        self._search_index = None
+        self._git = None
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def resolve(self, path):
+        """Absolute path for ``path``; refuses paths that escape the workspace."""
+        full_path = os.path.realpath(os.path.join(self.root, path or "."))
+        if full_path != self.root and not full_path.startswith(self.root + os.sep):
+            raise ValueError(f"Path escapes the workspace: {path}")
+        return full_path
+
+    def relative(self, full_path):
+        return os.path.relpath(full_path, self.root).replace(os.sep, "/")
+
+    def subscribe(self, callback):
+        """Call ``callback(changed_paths, removed_paths)`` whenever the index sees changes."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _notify(self, changed, removed):
+        for callback in self._listeners:
+            callback(changed, removed)
+
+    def mark_stale(self, background=True):
+        """Make the next ``refresh`` re-stat the tree (e.g. after a shell command ran).
+
+        With ``background`` the rescan starts right away on a daemon thread;
+        callers that refresh meanwhile wait for it instead of scanning twice.
+        """
+        with self._lock:
+            self._last_refresh = None
+        if not background:
+            return
+        with self._background_lock:
+            self._background_pending = True
+            if self._background is None:
+                self._background = threading.Thread(
+                    target=self._refresh_in_background, name="melius-refresh", daemon=True
+                )
+                self._background.start()
+
+    def _refresh_in_background(self):
+        while True:
+            with self._background_lock:
+                if not self._background_pending:
+                    self._background = None
+                    return
+                self._background_pending = False
+            try:
+                self.refresh(force=True)
+            except Exception:
+                pass
+
+    def refresh(self, force=False, max_age=None):
+        """Re-stat the tree; returns ``(added, modified, removed)`` path lists.
+
+        Skipped when the last scan is younger than ``max_age`` (default ``refresh_interval``).
+        """
+        with self._lock:
+            now = time.monotonic()
+            max_age = self.refresh_interval if max_age is None else max_age
+            if not force and self._last_refresh is not None and now - self._last_refresh < max_age:
+                return [], [], []
+            self.ignore.begin_scan()
+            # Listings of directories modified within the timestamp granularity
+            # of the scan could still change unnoticed; don't trust those next time.
+            settled = time.time_ns() - 2_000_000_000
+            dirs = {}
+            seen = set()
+            added, modified = [], []
+            # Each entry carries whether a .gitignore above it changed; only then
+            # does a whole subtree need re-listing.
+            stack = [("", False)]
+            while stack:
+                directory, relist = stack.pop()
+                path = os.path.join(self.root, directory)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                generation = self.ignore.generation
+                relist = relist or self.ignore.check(directory) != generation
+                cached = self.dirs.get(directory)
+                if not relist and cached is not None and cached[0] == mtime:
+                    subdirs, files = cached[1], cached[2]
+                    stats = []
+                    prefix = os.path.join(path, "")
+                    for name in files:
+                        try:
+                            stats.append((name, os.stat(prefix + name)))
+                        except OSError:
+                            continue
+                else:
+                    subdirs, files, stats = [], [], []
+                    try:
+                        scanner = os.scandir(path)
+                    except OSError:
+                        continue
+                    with scanner:
+                        for item in scanner:
+                            rel = f"{directory}/{item.name}" if directory else item.name
+                            try:
+                                is_dir = item.is_dir(follow_symlinks=False)
+                                if self.ignore.ignored(rel, is_dir):
+                                    continue
+                                if is_dir:
+                                    subdirs.append(item.name)
+                                    continue
+                                if not item.is_file():
+                                    continue
+                                stats.append((item.name, item.stat()))
+                            except OSError:
+                                continue
+                            files.append(item.name)
+                dirs[directory] = (mtime if mtime < settled else None, subdirs, files)
+                base = directory + "/" if directory else ""
+                stack.extend((base + name, relist) for name in subdirs)
+                for name, st in stats:
+                    rel = base + name
+                    seen.add(rel)
+                    entry = self.entries.get(rel)
+                    if entry is None:
+                        self.entries[rel] = FileEntry(st.st_size, st.st_mtime_ns)
+                        added.append(rel)
+                    elif entry.size != st.st_size or entry.mtime_ns != st.st_mtime_ns:
+                        self.entries[rel] = FileEntry(st.st_size, st.st_mtime_ns)
+                        modified.append(rel)
+            self.dirs = dirs
+            removed = [rel for rel in self.entries if rel not in seen]
+            for rel in removed:
+                del self.entries[rel]
+            self.changed.update(added, modified, removed)
+            if added or modified or removed:
+                self._notify(added + modified, removed)
+            self._last_refresh = time.monotonic()
+            return added, modified, removed
+
+    def search_index(self):
+        """Shared ``CodeSearchIndex`` over this workspace, built on first use."""
+        with self._lock:
+            if self._search_index is None:
+                from melius.core.search import CodeSearchIndex
+                self._search_index = CodeSearchIndex(self)
+            return self._search_index
+
+    def git(self):
+        """Shared ``GitWorkspace`` for repositories in this workspace, built on first use."""
+        with self._lock:
+            if self._git is None:
+                from melius.core.repo import GitWorkspace
+                self._git = GitWorkspace(self)
+            return self._git
+
+    def consume_changes(self, prefix=""):
+        """Paths added, modified or removed since the last call, limited to those under ``prefix``."""
+        with self._lock:
+            self.refresh(force=True)
+            if not prefix:
+                changed, self.changed = self.changed, set()
+            else:
+                prefix = prefix.rstrip("/") + "/"
+                changed = {rel for rel in self.changed if rel.startswith(prefix)}
+                self.changed -= changed
+            return sorted(changed)
+
+    def restore_changes(self, paths):
+        """Put paths taken by ``consume_changes`` back, e.g. when the commit that took them failed."""
+        with self._lock:
+            self.changed.update(paths)
+
+    def _entry(self, full_path):
+        """Up-to-date entry for a file, re-stat'ed on every call (cheap)."""
+        st = os.stat(full_path)
+        rel = self.relative(full_path)
+        with self._lock:
+            entry = self.entries.get(rel)
+            if entry is None or entry.size != st.st_size or entry.mtime_ns != st.st_mtime_ns:
+                entry = FileEntry(st.st_size, st.st_mtime_ns)
+                if not self.ignore.ignored(rel, False):
+                    self.entries[rel] = entry
+                    self.changed.add(rel)
+                    self._notify([rel], [])
+            return entry
+
+    def _read_bytes(self, full_path, size, offset=0, length=None):
+        end = size if length is None else min(size, offset + length)
+        if offset >= end:
+            return b""
+        with open(full_path, 'rb') as f:
+            if size >= self.mmap_threshold:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    return m[offset:end]
+            f.seek(offset)
+            return f.read(end - offset)
+
+    def digest(self, path):
+        full_path = self.resolve(path)
+        entry = self._entry(full_path)
+        if entry.digest is None:
+            h = hashlib.sha256()
+            with open(full_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(block)
+            entry.digest = h.hexdigest()
+        return entry.digest
+
+    def read(self, path, offset=0, length=None):
+        full_path = self.resolve(path)
+        entry = self._entry(full_path)
+        return self._read_bytes(full_path, entry.size, offset, length).decode("utf-8", errors="replace")
+
+    def _line_offsets(self, full_path, entry):
+        if entry.line_offsets is None:
+            offsets = array("Q", [0])
+            with open(full_path, 'rb') as f:
+                if entry.size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                        position = m.find(b"\n")
+                        while position != -1:
+                            offsets.append(position + 1)
+                            position = m.find(b"\n", position + 1)
+            entry.line_offsets = offsets
+        return entry.line_offsets
+
+    def read_lines(self, path, start_line=1, end_line=None):
+        """Lines ``start_line``..``end_line`` (1-based, inclusive) and the file's line count."""
+        full_path = self.resolve(path)
+        entry = self._entry(full_path)
+        offsets = self._line_offsets(full_path, entry)
+        total = len(offsets) if offsets[-1] < entry.size else len(offsets) - 1
+        start = max(int(start_line or 1), 1)
+        end = total if end_line is None else min(int(end_line), total)
+        if start > end:
+            return "", total
+        begin = offsets[start - 1]
+        finish = offsets[end] if end < len(offsets) else entry.size
+        return self._read_bytes(full_path, entry.size, begin, finish - begin).decode("utf-8", errors="replace"), total
+
+    def write(self, path, content):
+        """Atomically replace ``path`` with ``content`` (temp file + rename)."""
+        full_path = self.resolve(path)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".melius-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+            if os.path.exists(full_path):
+                os.chmod(tmp_path, os.stat(full_path).st_mode & 0o7777)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._entry(full_path)
+
+    def edit(self, path, old_text, new_text, occurrence=None):
+        """Replace one occurrence of ``old_text``.
+
+        ``old_text`` must be unique unless ``occurrence`` (1-based) says which match to change.
+        """
+        if not old_text:
+            raise ValueError("old_text must not be empty.")
+        content = self.read(path)
+        count = content.count(old_text)
+        if count == 0:
+            raise ValueError("Old text not found.")
+        if occurrence is None and count > 1:
+            raise ValueError(f"Old text matches {count} times; pass occurrence (1-{count}) or more context.")
+        occurrence = int(occurrence or 1)
+        if not 1 <= occurrence <= count:
+            raise ValueError(f"occurrence must be between 1 and {count}.")
+        position = -1
+        for _ in range(occurrence):
+            position = content.find(old_text, position + 1)
+        line = content.count("\n", 0, position) + 1
+        self.write(path, content[:position] + new_text + content[position + len(old_text):])
+        return line
+
+    def tree(self, path=".", pattern=None, max_depth=None, limit=500):
+        """Sorted relative paths under ``path``, filtered by glob ``pattern`` and depth."""
+        self.refresh()
+        base = self.relative(self.resolve(path))
+        prefix = "" if base == "." else base + "/"
+        with self._lock:
+            paths = [rel for rel in self.entries if rel.startswith(prefix)]
+        matches = []
+        collapsed = {}
+        for rel in sorted(paths):
+            local = rel[len(prefix):]
+            if max_depth is not None and local.count("/") >= int(max_depth):
+                folder = prefix + "/".join(local.split("/")[:int(max_depth)]) + "/"
+                collapsed[folder] = collapsed.get(folder, 0) + 1
+                continue
+            if pattern and not (fnmatch.fnmatch(local, pattern) or fnmatch.fnmatch(os.path.basename(local), pattern)):
+                continue
+            matches.append(rel)
+        if not pattern:
+            matches.extend(f"{folder} ({count} files)" for folder, count in collapsed.items())
+            matches.sort()
+        return matches[:limit], len(matches)
@@ -0,0 +1,109 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+class QueueFullError(Exception):
+    pass
+
+class JobCancelled(Exception):
+    """Passed to ``on_done`` for a queued job that ``cancel`` dropped before it ran."""
+
+class ChatDispatcher:
+    """Runs blocking agent jobs on a bounded thread pool, one FIFO queue per chat.
+
+    Jobs from the same chat run strictly in order; different chats run in
+    parallel up to ``max_workers``. Each chat may have at most ``max_queue``
+    jobs waiting, after which ``submit`` raises ``QueueFullError``.
+    """
+
+    def __init__(self, max_workers=None, max_queue=5, idle_timeout=300):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="melius-agent")
+        self.queues = {}
+        self.workers = {}
+        self.running = {}
+        self._notifying = set()
+
+    def submit(self, chat_id, job, on_done, on_start=None):
+        """Queue ``job()`` (a blocking callable) and await ``on_done(result, error)`` afterwards.
+
+        ``on_start()``, if given, is awaited just before the job leaves the queue.
+        """
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            queue = self.queues[chat_id] = asyncio.Queue(maxsize=self.max_queue)
+        try:
+            queue.put_nowait((job, on_done, on_start))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{queue.qsize()} jobs already queued for this chat.")
+        worker = self.workers.get(chat_id)
+        if worker is None or worker.done():
+            self.workers[chat_id] = asyncio.create_task(self._worker(chat_id, queue))
+        return queue.qsize()
+
+    async def _worker(self, chat_id, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                job, on_done, on_start = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                break
+            if on_start is not None:
+                try:
+                    await on_start()
+                except Exception:
+                    pass
+            self.running[chat_id] = loop.run_in_executor(self.executor, job)
+            result, error = None, None
+            try:
+                result = await self.running[chat_id]
+            except Exception as e:
+                error = e
+            finally:
+                self.running.pop(chat_id, None)
+            try:
+                await on_done(result, error)
+            except Exception:
+                pass
+        if self.queues.get(chat_id) is queue and queue.empty():
+            del self.queues[chat_id]
+            del self.workers[chat_id]
+
+    def cancel(self, chat_id):
+        """Drop queued jobs for a chat; returns how many were discarded.
+
+        Each dropped job's ``on_done`` still runs, with a ``JobCancelled`` error.
+        """
+        queue = self.queues.get(chat_id)
+        dropped = 0
+        while queue is not None and not queue.empty():
+            _, on_done, _ = queue.get_nowait()
+            task = asyncio.create_task(self._cancelled(on_done))
+            self._notifying.add(task)
+            task.add_done_callback(self._notifying.discard)
+            dropped += 1
+        return dropped
+
+    async def _cancelled(self, on_done):
+        try:
+            await on_done(None, JobCancelled())
+        except Exception:
+            pass
+
+    def is_running(self, chat_id):
+        return chat_id in self.running
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "running": len(self.running),
+            "queued": sum(q.qsize() for q in self.queues.values()),
+            "chats": len(self.queues),
+        }
+
+    def shutdown(self):
+        for worker in self.workers.values():
+            worker.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,193 @@
+import asyncio
+import io
+import re
+import time
+from telegram import InputFile
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+MESSAGE_LIMIT = 4096
+CAPTION_LIMIT = 1024
+_FENCE = re.compile(r'^\s*(`{3,}|~{3,})')
+
+def _pieces(text, size):
+    for line in text.splitlines(keepends=True):
+        for i in range(0, len(line), size):
+            yield line[i:i + size]
+
+def split_message(text, limit=MESSAGE_LIMIT):
+    """Split ``text`` into messages of at most ``limit`` chars.
+
+    Cuts prefer blank lines and the ends of code blocks. A block that has to be
+    cut anyway is closed at the end of one message and reopened, with its
+    language tag, at the start of the next, so every message renders on its own.
+    """
+    if len(text) <= limit:
+        return [text] if text.strip() else []
+    chunks = []
+    current = ""
+    fence = None       # opening line of the code block we're inside, if any
+    good_break = 0     # offset in ``current`` after a blank line / closed block
+    for piece in _pieces(text, limit // 4):
+        match = _FENCE.match(piece)
+        if fence is None and match:
+            new_fence = piece.strip()[:40]
+        elif fence is not None and match and piece.strip() == _FENCE.match(fence).group(1):
+            new_fence = None
+        else:
+            new_fence = fence
+        reserve = len(_FENCE.match(new_fence).group(1)) + 1 if new_fence else 0
+        if current and len(current) + len(piece) + reserve > limit:
+            if good_break > limit // 2:
+                chunks.append(current[:good_break])
+                current = current[good_break:]
+            else:
+                if fence:
+                    current += ("" if current.endswith("\n") else "\n") + _FENCE.match(fence).group(1)
+                chunks.append(current)
+                current = fence + "\n" if fence else ""
+            good_break = 0
+        current += piece
+        fence = new_fence
+        if fence is None and (match or not piece.strip()):
+            good_break = len(current)
+    if current.strip():
+        chunks.append(current)
+    return [chunk.strip("\n") for chunk in chunks if chunk.strip()]
+
+class OutboundQueue:
+    """Sends Telegram messages, edits and uploads within the flood limits.
+
+    Each chat has its own FIFO queue and worker, so messages keep their order
+    and one throttled chat doesn't hold up the others. Sends are spaced
+    ``chat_interval`` seconds apart per chat (``group_interval`` for groups),
+    and a shared token bucket caps the whole bot at ``global_rate`` calls per
+    second. ``RetryAfter`` is honoured and network errors are retried with
+    backoff. A queued edit of a message absorbs later edits of that message,
+    so a slow chat gets the latest text, not every intermediate one.
+    """
+
+    def __init__(self, bot, chat_interval=1.0, group_interval=3.0, global_rate=25, max_retries=5, idle_timeout=60):
+        self.bot = bot
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.global_rate = global_rate
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self.queues = {}
+        self.workers = {}
+        self.pending_edits = {}
+        self.next_slot = {}
+        self._tokens = float(global_rate)
+        self._refilled = time.monotonic()
+
+    def _enqueue(self, chat_id, item):
+        item["future"] = asyncio.get_running_loop().create_future()
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            queue = self.queues[chat_id] = asyncio.Queue()
+        queue.put_nowait(item)
+        worker = self.workers.get(chat_id)
+        if worker is None or worker.done():
+            self.workers[chat_id] = asyncio.create_task(self._worker(chat_id, queue))
+        return item["future"]
+
+    def send_text(self, chat_id, text):
+        return self._enqueue(chat_id, {"call": lambda item: self.bot.send_message(chat_id=chat_id, text=text)})
+
+    def send_document(self, chat_id, data, filename, caption=None):
+        return self._enqueue(chat_id, {"call": lambda item: self.bot.send_document(
+            chat_id=chat_id, document=InputFile(io.BytesIO(data), filename=filename), caption=caption
+        )})
+
+    def edit_text(self, chat_id, message_id, text):
+        """Queue an edit; replaces the text of an edit of the same message that hasn't gone out yet."""
+        key = (chat_id, message_id)
+        pending = self.pending_edits.get(key)
+        if pending is not None:
+            pending["text"] = text
+            return pending["future"]
+        item = {"text": text, "edit_key": key, "call": lambda item: self.bot.edit_message_text(
+            text=item["text"], chat_id=chat_id, message_id=message_id
+        )}
+        future = self._enqueue(chat_id, item)
+        # Progress edits are fire-and-forget; don't warn about unretrieved errors.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.pending_edits[key] = item
+        return future
+
+    async def _throttle(self, chat_id):
+        now = time.monotonic()
+        interval = self.group_interval if chat_id < 0 else self.chat_interval
+        slot = max(now, self.next_slot.get(chat_id, 0.0))
+        self.next_slot[chat_id] = slot + interval
+        self._tokens = min(float(self.global_rate), self._tokens + (now - self._refilled) * self.global_rate)
+        self._refilled = now
+        self._tokens -= 1
+        wait = max(slot - now, -self._tokens / self.global_rate if self._tokens < 0 else 0.0)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _call(self, chat_id, item):
+        attempt = 0
+        while True:
+            await self._throttle(chat_id)
+            try:
+                return await item["call"](item)
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+                self.next_slot[chat_id] = time.monotonic() + delay
+                attempt += 1
+                if attempt > self.max_retries * 2:
+                    raise
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    return None
+                raise
+            except NetworkError:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+    async def _worker(self, chat_id, queue):
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                break
+            if "edit_key" in item:
+                self.pending_edits.pop(item["edit_key"], None)
+            try:
+                result = await self._call(chat_id, item)
+            except Exception as e:
+                if not item["future"].done():
+                    item["future"].set_exception(e)
+            else:
+                if not item["future"].done():
+                    item["future"].set_result(result)
+        if self.queues.get(chat_id) is queue and queue.empty():
+            del self.queues[chat_id]
+            del self.workers[chat_id]
+
+    def stats(self):
+        return {"chats": len(self.queues), "queued": sum(q.qsize() for q in self.queues.values())}
+
+async def deliver(outbox, chat_id, text, filename="melius-output.txt", max_messages=3):
+    """Send a reply as messages, or as a document when it would take more than ``max_messages``.
+
+    Diffs longer than one message always go out as a ``.diff`` document.
+    """
+    text = text or "(empty response)"
+    is_diff = text.lstrip().startswith("diff --git") or "\ndiff --git " in text
+    chunks = split_message(text)
+    if len(chunks) <= max_messages and not (is_diff and len(chunks) > 1):
+        for chunk in chunks:
+            await outbox.send_text(chat_id, chunk)
+        return
+    if is_diff and filename.endswith(".txt"):
+        filename = filename[:-4] + ".diff"
+    lines = text.count("\n") + 1
+    head = text[:CAPTION_LIMIT - 120].rsplit("\n", 1)[0]
+    caption = f"{head}\n…\n📎 {lines} lines, {len(text)} chars; full output attached."
+    await outbox.send_document(chat_id, text.encode("utf-8"), filename, caption[:CAPTION_LIMIT])
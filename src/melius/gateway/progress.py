@@ -0,0 +1,68 @@
+import asyncio
+import collections
+
+class LiveOutput:
+    """Mirrors agent progress (current tool step plus the tail of command output) into one status message.
+
+    ``add`` and ``step`` are called from agent worker threads. At most one edit
+    per ``interval`` seconds is queued, and only when something changed. The
+    ``OutboundQueue`` merges it with any edit that is still waiting for a flood slot.
+    """
+
+    def __init__(self, outbox, chat_id, message_id, title="⚙️ Working...", interval=3.0, max_lines=15,
+                 max_line_chars=200):
+        self.outbox = outbox
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.title = title
+        self.interval = interval
+        self.max_line_chars = max_line_chars
+        self.lines = collections.deque(maxlen=max_lines)
+        self.current_step = None
+        self.steps = 0
+        self.changed = False
+        self.task = None
+
+    def add(self, stream, line):
+        self.lines.append(line[:self.max_line_chars])
+        self.changed = True
+
+    def step(self, tool, params):
+        detail = next((str(v) for v in (params or {}).values() if isinstance(v, (str, int, float))), "")
+        self.steps += 1
+        self.current_step = f"🔧 {tool} {detail[:60]}".rstrip()
+        self.lines.clear()
+        self.changed = True
+
+    def render(self):
+        header = self.title if not self.steps else f"{self.title} (step {self.steps})"
+        parts = [header]
+        if self.current_step:
+            parts.append(self.current_step)
+        if self.lines:
+            parts.append("\n".join(self.lines))
+        return "\n".join(parts)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def finish(self, text):
+        """Stop updating and replace the status with a final line."""
+        await self.stop()
+        self.outbox.edit_text(self.chat_id, self.message_id, text)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.changed:
+                continue
+            self.changed = False
+            self.outbox.edit_text(self.chat_id, self.message_id, self.render())
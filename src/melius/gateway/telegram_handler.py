@@ -1,9 +1,12 @@
-import asyncio
 import os
 import json
 from telegram import Update, ReplyKeyboardMarkup
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
 from melius.core.agent import MeliusAgent
+from melius.core.session import SessionStore
+from melius.gateway.dispatcher import ChatDispatcher, JobCancelled, QueueFullError
+from melius.gateway.output import OutboundQueue, deliver
+from melius.gateway.progress import LiveOutput
 from rich.console import Console
 
 console = Console()
@@ -12,9 +15,28 @@ class MeliusGateway:
     def __init__(self, token, allowed_user_id=None):
         self.token = token
         self.allowed_user_id = allowed_user_id
-        self.agent = MeliusAgent()
+        self.max_workers = None
+        self.max_queue = 5
+        self.max_sessions = 32
+        self.session_ttl = 3600
+        self.history_token_budget = 24000
+        self.metrics_host = "127.0.0.1"
+        self.metrics_port = 9464
         self.config_path = os.path.expanduser("~/.melius/telegram_config.json")
         self.load_config()
+        self.agent = MeliusAgent()
+        self.sessions = SessionStore(self.new_session, self.max_sessions, self.session_ttl)
+        self.dispatcher = ChatDispatcher(self.max_workers, self.max_queue)
+        self.outbox = None
+
+    def new_session(self, chat_id):
+        return MeliusAgent(
+            self.agent.workspace_dir,
+            provider=self.agent.provider,
+            skills=self.agent.skill_manager(),
+            workspace=self.agent.workspace,
+            history_token_budget=self.history_token_budget
+        )
 
     def load_config(self):
         if os.path.exists(self.config_path):
@@ -22,6 +44,13 @@ class MeliusGateway:
                 config = json.load(f)
                 self.token = config.get("token", self.token)
                 self.allowed_user_id = config.get("allowed_user_id", self.allowed_user_id)
+                self.max_workers = config.get("max_workers", self.max_workers)
+                self.max_queue = config.get("max_queue_per_chat", self.max_queue)
+                self.max_sessions = config.get("max_sessions", self.max_sessions)
+                self.session_ttl = config.get("session_ttl", self.session_ttl)
+                self.history_token_budget = config.get("history_token_budget", self.history_token_budget)
+                self.metrics_host = config.get("metrics_host", self.metrics_host)
+                self.metrics_port = config.get("metrics_port", self.metrics_port)
 
     def save_config(self):
         os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
@@ -37,7 +66,7 @@ class MeliusGateway:
             await update.message.reply_text("Unauthorized access. This agent is private.")
             return
 
-        keyboard = [['/status', '/workspace'], ['/help', '/stop_gateway']]
+        keyboard = [['/status', '/workspace'], ['/cancel', '/help']]
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
         
         await update.message.reply_text(
@@ -50,34 +79,110 @@ class MeliusGateway:
             return
 
         user_text = update.message.text
-        await update.message.reply_text("🤖 Melius is thinking...")
-        
-        # Execute agent cycle
+        chat_id = update.effective_chat.id
+        agent = self.sessions.get(chat_id)
+
+        busy = self.dispatcher.is_running(chat_id)
+        status_message = await self.outbox.send_text(chat_id, "🕒 Queued..." if busy else "🤖 Melius is thinking...")
+        live = LiveOutput(self.outbox, chat_id, status_message.message_id)
+
+        def job():
+            agent.cancel_event.clear()
+            agent.on_output = live.add
+            agent.on_progress = live.step
+            try:
+                return agent.run_cycle(user_text)
+            finally:
+                agent.on_output = None
+                agent.on_progress = None
+
+        async def on_start():
+            # Live output runs only while the job does, so a dropped job leaves no updater behind.
+            if busy:
+                self.outbox.edit_text(chat_id, status_message.message_id, "🤖 Melius is thinking...")
+            live.start()
+
+        async def on_done(response, error):
+            if isinstance(error, JobCancelled):
+                await live.finish("🛑 Cancelled before it started.")
+            elif error is not None:
+                await live.finish("❌ Failed.")
+                await self.outbox.send_text(chat_id, f"❌ Error: {str(error)}")
+            else:
+                steps = f" after {live.steps} tool steps" if live.steps else ""
+                await live.finish(f"✅ Done{steps}.")
+                await deliver(self.outbox, chat_id, response)
+
         try:
-            response = self.agent.run_cycle(user_text)
-            await update.message.reply_text(response)
-        except Exception as e:
-            await update.message.reply_text(f"❌ Error: {str(e)}")
+            position = self.dispatcher.submit(chat_id, job, on_done, on_start)
+        except QueueFullError as e:
+            self.outbox.edit_text(chat_id, status_message.message_id, f"⏳ Melius is busy: {e} Try again later or /cancel.")
+            return
+        if busy:
+            self.outbox.edit_text(chat_id, status_message.message_id, f"🕒 Queued (position {position}).")
+
+    async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if self.allowed_user_id and update.effective_user.id != self.allowed_user_id:
+            return
+
+        chat_id = update.effective_chat.id
+        dropped = self.dispatcher.cancel(chat_id)
+        agent = self.sessions.peek(chat_id)
+        if agent and self.dispatcher.is_running(chat_id):
+            agent.cancel_event.set()
+            await update.message.reply_text(f"🛑 Cancelling the current task ({dropped} queued dropped).")
+        else:
+            await update.message.reply_text(f"🛑 Nothing running ({dropped} queued dropped).")
 
     async def status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        await update.message.reply_text("✅ Melius is online and monitoring the workspace.")
+        stats = self.dispatcher.stats()
+        text = (
+            "✅ Melius is online and monitoring the workspace.\n"
+            f"Jobs running: {stats['running']}/{stats['workers']} · queued: {stats['queued']}"
+            f" · outgoing: {self.outbox.stats()['queued']}"
+        )
+        provider = self.agent.provider
+        if provider.config["active_provider"] == "ollama":
+            local = provider.ollama.stats()
+            text += f"\nOllama: {local['busy']}/{local['parallel']} busy · waiting: {local['waiting']}"
+        await update.message.reply_text(text)
 
     async def workspace(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        files = os.listdir(self.agent.workspace_dir)
-        file_list = "\n".join([f"📄 {f}" for f in files]) or "Workspace is empty."
-        await update.message.reply_text(f"Current Workspace Files:\n{file_list}")
+        paths, total = self.agent.workspace.tree(max_depth=2, limit=100)
+        file_list = "\n".join([f"📄 {f}" for f in paths]) or "Workspace is empty."
+        if total > len(paths):
+            file_list += f"\n… and {total - len(paths)} more"
+        await deliver(self.outbox, update.effective_chat.id, f"Current Workspace Files:\n{file_list}", "workspace.txt")
 
     def run(self):
         if not self.token:
             console.print("[red]Error: Telegram token not configured. Use 'melius connect' first.[/red]")
             return
 
-        application = ApplicationBuilder().token(self.token).build()
+        application = ApplicationBuilder().token(self.token).concurrent_updates(True).build()
+        self.outbox = OutboundQueue(application.bot)
         
         application.add_handler(CommandHandler('start', self.start))
         application.add_handler(CommandHandler('status', self.status))
         application.add_handler(CommandHandler('workspace', self.workspace))
+        application.add_handler(CommandHandler('cancel', self.cancel))
         application.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), self.handle_message))
         
+        metrics = None
+        if self.metrics_port:
+            from melius.core.tracing import serve_metrics
+            try:
+                metrics = serve_metrics(self.metrics_host, self.metrics_port)
+                console.print(f"[dim]Metrics at http://{self.metrics_host}:{self.metrics_port}/metrics[/dim]")
+            except OSError as e:
+                console.print(f"[yellow]Metrics endpoint disabled: {e}[/yellow]")
+
+        # Load the local model now rather than on the first message.
+        self.agent.provider.warm_up()
         console.print(f"[bold green]Melius Gateway started.[/bold green] Monitoring Telegram...")
-        application.run_polling()
+        try:
+            application.run_polling()
+        finally:
+            self.dispatcher.shutdown()
+            if metrics:
+                metrics.shutdown()
@@ -0,0 +1,135 @@
+import itertools
+import threading
+import time
+
+def _reset_time(value, now):
+    """Rate-limit reset headers come as epoch ms, epoch seconds or a delta in seconds."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value > 1e11:
+        return value / 1000
+    if value > 1e9:
+        return value
+    return now + value
+
+class KeyState:
+    def __init__(self, key):
+        self.key = key
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0
+        self.cooldown_until = 0
+        self.failures = 0
+        self.in_flight = 0
+
+class KeyScheduler:
+    """Spreads requests over API keys using the provider's rate-limit headers.
+
+    Each key is a token bucket: ``X-RateLimit-Remaining`` is the fill level and
+    ``X-RateLimit-Reset`` is when it refills. Acquiring a key spends a token
+    locally, so concurrent requests fan out before the next headers arrive.
+    429s and 5xx errors put a key on cooldown, using ``Retry-After`` when given
+    and exponential backoff otherwise.
+    """
+
+    def __init__(self, keys=(), base_cooldown=5, max_cooldown=300):
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.states = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self.sync(keys)
+
+    def sync(self, keys):
+        with self._lock:
+            for key in keys:
+                self.states.setdefault(key, KeyState(key))
+            for key in list(self.states):
+                if key not in keys:
+                    del self.states[key]
+
+    def _usable(self, state, now):
+        if state.cooldown_until > now:
+            return False
+        return state.remaining is None or state.remaining > 0 or state.reset_at <= now
+
+    def acquire(self, exclude=()):
+        """Reserve the key with the most headroom, or return None if all are limited."""
+        now = time.time()
+        with self._lock:
+            candidates = [s for s in self.states.values() if s.key not in exclude and self._usable(s, now)]
+            if not candidates:
+                return None
+            turn = next(self._order)
+            state = min(candidates, key=lambda s: (
+                s.in_flight,
+                -(s.remaining if s.remaining is not None and s.reset_at > now else float("inf")),
+                (list(self.states).index(s.key) - turn) % len(self.states)
+            ))
+            state.in_flight += 1
+            if state.remaining is not None and state.reset_at > now:
+                state.remaining -= 1
+            return state.key
+
+    def release(self, key, status=None, headers=None):
+        """Return a key after a request, updating its bucket from the response."""
+        now = time.time()
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        with self._lock:
+            state = self.states.get(key)
+            if state is None:
+                return
+            state.in_flight = max(state.in_flight - 1, 0)
+            if "x-ratelimit-remaining" in headers:
+                try:
+                    state.remaining = int(float(headers["x-ratelimit-remaining"]))
+                except ValueError:
+                    pass
+            if "x-ratelimit-limit" in headers:
+                try:
+                    state.limit = int(float(headers["x-ratelimit-limit"]))
+                except ValueError:
+                    pass
+            reset_at = _reset_time(headers.get("x-ratelimit-reset"), now)
+            if reset_at:
+                state.reset_at = reset_at
+
+            if status == 429 or (status or 0) >= 500 or status is None:
+                state.failures += 1
+                retry_after = _reset_time(headers.get("retry-after"), now)
+                if retry_after:
+                    state.cooldown_until = retry_after
+                elif status == 429 and state.reset_at > now:
+                    state.cooldown_until = state.reset_at
+                else:
+                    delay = self.base_cooldown * 2 ** (state.failures - 1)
+                    state.cooldown_until = now + min(delay, self.max_cooldown)
+                if status == 429:
+                    state.remaining = 0
+            elif status < 400:
+                state.failures = 0
+
+    def next_available(self):
+        """Seconds until some key can be used again (0 if one is usable now)."""
+        now = time.time()
+        with self._lock:
+            waits = []
+            for state in self.states.values():
+                if self._usable(state, now):
+                    return 0
+                blocked_until = max(state.cooldown_until, state.reset_at if state.remaining == 0 else 0)
+                waits.append(blocked_until - now)
+            return max(min(waits), 0) if waits else None
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return [{
+                "key": state.key[:8] + "...",
+                "remaining": state.remaining,
+                "limit": state.limit,
+                "in_flight": state.in_flight,
+                "cooldown": max(round(state.cooldown_until - now, 1), 0),
+            } for state in self.states.values()]
@@ -0,0 +1,106 @@
+import asyncio
+import contextlib
+import os
+import time
+
+from melius.models.transport import get_transport
+
+def model_name(name):
+    # /api/ps and /api/tags report "llama3:latest" for a model configured as "llama3".
+    return name if ":" in name else name + ":latest"
+
+class OllamaManager:
+    """Lists, loads and pins models through the Ollama HTTP API, and bounds local concurrency.
+
+    Every chat request carries ``keep_alive`` (``-1`` when ``pin`` is set), so
+    the active model stays resident between turns instead of unloading after
+    Ollama's 5 minute default. ``warm`` loads it ahead of the first request.
+    ``slot`` admits at most ``parallel`` requests at once; more would only
+    wait in Ollama's own queue, where they can hit the read timeout.
+    """
+
+    def __init__(self, host="http://localhost:11434", keep_alive="30m", pin=False, parallel=None,
+                 small_model=None, small_max_tokens=1500, tags_ttl=30, load_timeout=600):
+        self.host = host.rstrip("/")
+        self.keep_alive = -1 if pin else keep_alive
+        # Match the server's OLLAMA_NUM_PARALLEL when the client runs next to it.
+        self.parallel = parallel or int(os.environ.get("OLLAMA_NUM_PARALLEL") or 1)
+        self.small_model = small_model
+        self.small_max_tokens = small_max_tokens
+        self.tags_ttl = tags_ttl
+        self.load_timeout = load_timeout
+        self.busy = 0
+        self.waiting = 0
+        self._semaphore = None
+        self._tags = (0.0, None)
+        self._warming = {}
+
+    async def _call(self, method, path, body=None, timeout=None):
+        return await get_transport().request_json("ollama", method, self.host + path, body, timeout)
+
+    async def models(self, refresh=False):
+        """Installed models (``/api/tags``), cached for ``tags_ttl`` seconds."""
+        fetched, models = self._tags
+        if refresh or models is None or time.monotonic() - fetched > self.tags_ttl:
+            models = (await self._call("GET", "/api/tags")).get("models", [])
+            self._tags = (time.monotonic(), models)
+        return models
+
+    async def running(self):
+        """Models currently in memory (``/api/ps``)."""
+        return (await self._call("GET", "/api/ps")).get("models", [])
+
+    async def load(self, model, keep_alive=None, num_ctx=None):
+        """Load ``model`` into memory; a generate request without a prompt only loads it."""
+        body = {"model": model, "keep_alive": self.keep_alive if keep_alive is None else keep_alive}
+        if num_ctx:
+            # A different num_ctx than the chat requests use would make Ollama reload the model.
+            body["options"] = {"num_ctx": num_ctx}
+        return await self._call("POST", "/api/generate", body, self.load_timeout)
+
+    async def unload(self, model):
+        return await self._call("POST", "/api/generate", {"model": model, "keep_alive": 0})
+
+    async def warm(self, model, num_ctx=None):
+        """Load ``model`` unless it is already resident; concurrent calls share one load."""
+        task = self._warming.get(model)
+        if task is None or task.done():
+            task = self._warming[model] = asyncio.ensure_future(self._warm(model, num_ctx))
+        return await asyncio.shield(task)
+
+    async def _warm(self, model, num_ctx):
+        try:
+            if model_name(model) in {m.get("name") for m in await self.running()}:
+                return "loaded"
+            await self.load(model, num_ctx=num_ctx)
+            return "warmed"
+        except Exception as e:
+            return f"error: {e}"
+
+    def route(self, model, history):
+        """Send short conversations to ``small_model`` when one is configured."""
+        if not self.small_model:
+            return model
+        tokens = getattr(history, "total_tokens", None)
+        if tokens is None:
+            tokens = sum(len(m.get("content") or "") for m in history) // 4
+        return self.small_model if tokens <= self.small_max_tokens else model
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.parallel)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.busy += 1
+        try:
+            yield
+        finally:
+            self.busy -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {"parallel": self.parallel, "busy": self.busy, "waiting": self.waiting}
@@ -1,91 +1,341 @@
-import requests
+import copy
 import json
 import subprocess
 import os
+import time
 from rich.console import Console
+from melius.models.keys import KeyScheduler
 
 console = Console()
 
+DEFAULT_CONFIG = {
+    "active_provider": "openrouter",
+    "openrouter_keys": [],
+    "default_model": "anthropic/claude-3.5-sonnet",
+    "ollama_model": "llama3",
+    "openrouter_url": "https://openrouter.ai/api/v1/chat/completions",
+    "ollama_host": "http://localhost:11434",
+    "openrouter_retries": 3,
+    "openrouter_max_wait": 30,
+    "fallback_to_ollama": False,
+    "browser": {
+        "max_pages": 4,
+        "max_uses": 50,
+        "blocked_resources": ["image", "font", "media"]
+    },
+    "response_cache": {
+        "enabled": False,
+        "ttl": 604800,
+        "max_bytes": 67108864
+    },
+    "skills": {
+        "isolated": True,
+        "workers": None,
+        "timeout": 60,
+        "memory_limit_mb": 1024,
+        "max_calls": 100
+    },
+    "web_cache": {
+        "max_bytes": 268435456,
+        "fresh_for": 60
+    },
+    "batch": {
+        "concurrency": 4
+    },
+    "tracing": {
+        "enabled": True,
+        "directory": "~/.melius/traces",
+        "retention_days": 7
+    },
+    "context": {
+        "reserve_output_tokens": 4096,
+        "default_window": 32000,
+        "windows": {},
+        "ollama_num_ctx": 8192,
+        "prompt_caching": True,
+        "native_tools": False
+    },
+    "ollama": {
+        "keep_alive": "30m",
+        "pin": False,
+        "parallel": None,
+        "small_model": None,
+        "small_max_tokens": 1500,
+        "warm_on_start": True
+    }
+}
+
+class ErrorText(str):
+    """A provider failure reported in the completion stream.
+
+    It reads like any other text, but callers can tell it apart from model
+    output with ``isinstance``.
+    """
+
 class ModelProvider:
     def __init__(self, config_path="~/.melius/config.json"):
         self.config_path = os.path.expanduser(config_path)
         self.load_config()
+        self.key_scheduler = KeyScheduler(self.config["openrouter_keys"])
+        self._response_cache = None
+        self._contexts = {}
+        self._ollama = None
 
     def load_config(self):
         if os.path.exists(self.config_path):
             with open(self.config_path, 'r') as f:
                 self.config = json.load(f)
+            for key, value in DEFAULT_CONFIG.items():
+                current = self.config.setdefault(key, copy.deepcopy(value))
+                if isinstance(value, dict) and isinstance(current, dict):
+                    # A section that sets only some options keeps the defaults for the rest.
+                    for option, default in value.items():
+                        current.setdefault(option, copy.deepcopy(default))
         else:
-            self.config = {
-                "active_provider": "openrouter",
-                "openrouter_keys": [],
-                "default_model": "anthropic/claude-3.5-sonnet",
-                "ollama_model": "llama3"
-            }
-            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-            self.save_config()
+            # Written on the first save_config(); read-only commands stay side-effect free.
+            self.config = copy.deepcopy(DEFAULT_CONFIG)
 
     def save_config(self):
+        os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
         with open(self.config_path, 'w') as f:
             json.dump(self.config, f, indent=4)
 
-    def query_model(self, system_prompt, history):
+    def query_model(self, system_prompt, history, cache=None, tools=None):
+        return "".join(self.stream_model(system_prompt, history, cache, tools))
+
+    def stream_model(self, system_prompt, history, cache=None, tools=None):
+        """Yield the completion in chunks as the provider produces them.
+
+        ``cache`` overrides the ``response_cache.enabled`` setting for this call.
+        ``tools`` (OpenAI-style function schemas) enables native tool calling;
+        the calls come back as the same JSON text the prompt protocol uses.
+        """
+        # The async stack (asyncio, aiohttp, sqlite) loads on first query, not
+        # on import, so config-only commands like `melius models list` stay fast.
+        from melius.core.tracing import get_tracer
+
         if self.config["active_provider"] == "openrouter":
-            return self.query_openrouter(system_prompt, history)
+            model = "openrouter:" + self.config["default_model"]
         elif self.config["active_provider"] == "ollama":
-            return self.query_ollama(system_prompt, history)
-        return "Error: No active provider configured."
+            model = "ollama:" + self.config["ollama_model"]
+        else:
+            yield ErrorText("Error: No active provider configured.")
+            return
+
+        tracer = get_tracer(**self.config["tracing"])
+        request_chars = len(system_prompt) + sum(len(m.get("content") or "") for m in history)
+        span = tracer.start("model", model, bytes_in=request_chars, prompt_tokens=request_chars // 4 + 1)
+        received = 0
+        try:
+            for chunk in self._stream_model(model, system_prompt, history, cache, tools, span):
+                if not received:
+                    span.set(first_chunk_ms=round((time.perf_counter() - span.started) * 1000, 1))
+                if isinstance(chunk, ErrorText):
+                    span.error = "ProviderError"
+                received += len(chunk)
+                yield chunk
+        except GeneratorExit:
+            raise  # the caller stopped reading (e.g. at a tool call), not a failure
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.set(bytes_out=received, completion_tokens=received // 4 + 1 if received else 0)
+            tracer.finish(span)
+
+    def _stream_model(self, model, system_prompt, history, cache, tools, span):
+        from melius.core.runtime import get_background_loop
+
+        stream = self.stream_openrouter if model.startswith("openrouter:") else self.stream_ollama
+        if cache is None:
+            cache = self.config["response_cache"].get("enabled", False)
+        if not cache:
+            yield from get_background_loop().iterate(stream(system_prompt, history, tools))
+            return
+
+        from melius.models.cache import cache_key
+        key = cache_key(model, system_prompt, history)
+        cached = self.response_cache.get(key)
+        span.set(cache_hit=cached is not None)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        try:
+            for chunk in get_background_loop().iterate(stream(system_prompt, history, tools)):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            # Store what the caller consumed, even if it stopped early after a
+            # tool call: a replay of the same request then sees the same text.
+            text = "".join(chunks)
+            if text and not any(isinstance(chunk, ErrorText) for chunk in chunks):
+                self.response_cache.put(key, model, text)
+
+    def context_for(self, system_prompt, tools=None, prompt_caching=False):
+        """The ``ContextBuilder`` for this prompt; agents reuse one prompt, so this is a dict hit."""
+        from melius.core.context import ContextBuilder
+
+        key = (system_prompt, id(tools) if tools else None, prompt_caching)
+        builder = self._contexts.get(key)
+        if builder is None:
+            if len(self._contexts) >= 16:
+                self._contexts.pop(next(iter(self._contexts)))
+            builder = self._contexts[key] = ContextBuilder(system_prompt, tools, prompt_caching)
+        return builder
+
+    def request_body(self, model, system_prompt, history, tools=None, ollama=False):
+        """Encode a streaming chat request, trimmed to fit ``model``'s context window."""
+        from melius.core.context import context_window
+
+        settings = self.config["context"]
+        if ollama:
+            window = settings["ollama_num_ctx"]
+            fields = {"model": model, "stream": True, "keep_alive": self.ollama.keep_alive,
+                      "options": {"num_ctx": window}}
+        else:
+            window = context_window(model, settings.get("windows"), settings["default_window"])
+            fields = {"model": model, "stream": True}
+        # Explicit cache breakpoints are an Anthropic feature; other providers cache prefixes implicitly.
+        caching = settings.get("prompt_caching", False) and not ollama and model.startswith("anthropic/")
+        builder = self.context_for(system_prompt, tools, caching)
+        reserve = min(settings["reserve_output_tokens"], window // 4)
+        return builder.body(fields, history, window, reserve)
+
+    @property
+    def ollama(self):
+        if self._ollama is None:
+            from melius.models.ollama import OllamaManager
+            settings = dict(self.config["ollama"])
+            settings.pop("warm_on_start", None)
+            self._ollama = OllamaManager(self.config["ollama_host"], **settings)
+        return self._ollama
+
+    def warm_up(self):
+        """Start loading the local model(s) in the background when Ollama is the active provider.
+
+        Returns a future resolving to ``{model: "loaded" | "warmed" | "error: ..."}``, or None.
+        """
+        if self.config["active_provider"] != "ollama" or not self.config["ollama"].get("warm_on_start"):
+            return None
+        import asyncio
+        from melius.core.runtime import get_background_loop
+
+        num_ctx = self.config["context"]["ollama_num_ctx"]
+        models = [self.config["ollama_model"]] + [m for m in [self.ollama.small_model] if m]
+
+        async def warm():
+            results = await asyncio.gather(*(self.ollama.warm(model, num_ctx) for model in models))
+            return dict(zip(models, results))
+
+        return get_background_loop().submit(warm())
+
+    @property
+    def response_cache(self):
+        if self._response_cache is None:
+            from melius.models.cache import ResponseCache
+            settings = dict(self.config["response_cache"])
+            settings.pop("enabled", None)
+            self._response_cache = ResponseCache(**settings)
+        return self._response_cache
+
+    def query_openrouter(self, system_prompt, history, tools=None):
+        from melius.core.runtime import get_background_loop
+        return "".join(get_background_loop().iterate(self.stream_openrouter(system_prompt, history, tools)))
+
+    def query_ollama(self, system_prompt, history, tools=None):
+        from melius.core.runtime import get_background_loop
+        return "".join(get_background_loop().iterate(self.stream_ollama(system_prompt, history, tools)))
+
+    async def stream_openrouter(self, system_prompt, history, tools=None):
+        import asyncio
+        import random
+        from melius.models.transport import get_transport
 
-    def query_openrouter(self, system_prompt, history):
         if not self.config["openrouter_keys"]:
-            return "Error: No OpenRouter API keys found. Use 'melius models add-key' to add one."
+            yield ErrorText("Error: No OpenRouter API keys found. Use 'melius models add-key' to add one.")
+            return
         
-        # Simple round-robin or first-available key strategy
-        api_key = self.config["openrouter_keys"][0]
+        scheduler = self.key_scheduler
+        scheduler.sync(self.config["openrouter_keys"])
         
         headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
             "HTTP-Referer": "https://melius.ai", # Optional
             "X-Title": "Melius CLI"
         }
         
-        messages = [{"role": "system", "content": system_prompt}] + history
+        data = self.request_body(self.config["default_model"], system_prompt, history, tools)
         
-        data = {
-            "model": self.config["default_model"],
-            "messages": messages
-        }
-        
-        try:
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                data=json.dumps(data),
-                timeout=60
-            )
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content']
-        except Exception as e:
-            return f"Error querying OpenRouter: {str(e)}"
-
-    def query_ollama(self, system_prompt, history):
-        messages = [{"role": "system", "content": system_prompt}] + history
-        data = {
-            "model": self.config["ollama_model"],
-            "messages": messages,
-            "stream": False
-        }
+        error = "all API keys are rate limited"
+        tried = set()
+        # openrouter_max_wait bounds the whole call's waiting and retrying, not each wait.
+        deadline = time.monotonic() + self.config["openrouter_max_wait"]
+        for attempt in range(self.config["openrouter_retries"] + 1):
+            if attempt and time.monotonic() >= deadline:
+                error += f" (gave up after {self.config['openrouter_max_wait']}s)"
+                break
+            api_key = scheduler.acquire(exclude=tried)
+            if api_key is None and tried:
+                tried.clear()
+                api_key = scheduler.acquire()
+            if api_key is None:
+                wait = scheduler.next_available()
+                if wait is None or wait > deadline - time.monotonic():
+                    break
+                await asyncio.sleep(wait)
+                continue
+            tried.add(api_key)
+            response = {}
+            streamed = False
+            failed = False
+            try:
+                async for chunk in get_transport().stream_openrouter(
+                    self.config["openrouter_url"], api_key, data, headers,
+                    on_response=lambda status, h: response.update(status=status, headers=h)
+                ):
+                    streamed = True
+                    yield chunk
+                return
+            except Exception as e:
+                failed = True
+                status = getattr(e, "status", None)
+                scheduler.release(api_key, status, getattr(e, "headers", response.get("headers")))
+                error = str(e)
+                if streamed or (status is not None and status != 429 and status < 500):
+                    # Client errors won't improve on retry, and text already sent can't be unsent.
+                    yield ErrorText(f"Error querying OpenRouter: {error}")
+                    return
+            finally:
+                if not failed:
+                    # Also reached when the caller stops reading early, e.g. after a tool call.
+                    scheduler.release(api_key, response.get("status", 200), response.get("headers"))
+            if len(tried) >= len(self.config["openrouter_keys"]):
+                # Every key failed this round; back off before cycling through them again.
+                backoff = min(2 ** attempt, 30) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(max(min(backoff, deadline - time.monotonic()), 0))
+
+        if self.config["fallback_to_ollama"]:
+            console.print(f"[yellow]OpenRouter unavailable ({error}); falling back to Ollama.[/yellow]")
+            async for chunk in self.stream_ollama(system_prompt, history, tools):
+                if isinstance(chunk, ErrorText):
+                    # Report both failures; the OpenRouter one is usually the one to fix.
+                    chunk = ErrorText(f"Error querying OpenRouter: {error}. Fallback failed too: {chunk}")
+                yield chunk
+            return
+        yield ErrorText(f"Error querying OpenRouter: {error}")
+
+    async def stream_ollama(self, system_prompt, history, tools=None):
+        from melius.models.transport import get_transport
+
+        model = self.ollama.route(self.config["ollama_model"], history)
+        data = self.request_body(model, system_prompt, history, tools, ollama=True)
         try:
-            response = requests.post(
-                "http://localhost:11434/api/chat",
-                json=data,
-                timeout=120
-            )
-            response.raise_for_status()
-            return response.json()['message']['content']
+            url = self.config["ollama_host"].rstrip("/") + "/api/chat"
+            async with self.ollama.slot():
+                async for chunk in get_transport().stream_ollama(url, data):
+                    yield chunk
         except Exception as e:
-            return f"Error querying Ollama: {str(e)}. Is Ollama running?"
+            yield ErrorText(f"Error querying Ollama: {str(e)}. Is Ollama running?")
 
     def install_ollama(self):
         """Install Ollama automatically."""
@@ -99,8 +349,46 @@ class ModelProvider:
             return False
 
     def list_ollama_models(self):
+        from melius.core.runtime import get_background_loop
+        from melius.models.ollama import model_name
+
+        async def fetch():
+            return await self.ollama.models(refresh=True), await self.ollama.running()
+
         try:
-            result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-            return result.stdout
-        except:
-            return "Ollama not found."
+            installed, running = get_background_loop().run(fetch(), timeout=15)
+        except Exception as e:
+            return f"Ollama not reachable at {self.config['ollama_host']} ({e})."
+        if not installed:
+            return "No local models installed. Pull one with 'ollama pull <model>'."
+        loaded = {m.get("name"): m for m in running}
+        active = model_name(self.config["ollama_model"])
+        lines = []
+        for m in sorted(installed, key=lambda m: m.get("name", "")):
+            name = m.get("name", "")
+            details = m.get("details") or {}
+            line = f"{'*' if name == active else ' '} {name:<32} {m.get('size', 0) / 1e9:6.1f} GB"
+            line += f"  {details.get('parameter_size', '')} {details.get('quantization_level', '')}".rstrip()
+            if name in loaded:
+                line += f"  [loaded, until {loaded[name].get('expires_at', '?')[:19]}]"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def manage_ollama(self, action, model=None):
+        """Load, pin or unload a local model; returns a status line."""
+        from melius.core.runtime import get_background_loop
+
+        model = model or self.config["ollama_model"]
+        num_ctx = self.config["context"]["ollama_num_ctx"]
+        if action == "load":
+            call = self.ollama.load(model, num_ctx=num_ctx)
+        elif action == "pin":
+            call = self.ollama.load(model, keep_alive=-1, num_ctx=num_ctx)
+        else:
+            call = self.ollama.unload(model)
+        try:
+            get_background_loop().run(call, timeout=self.ollama.load_timeout + 5)
+        except Exception as e:
+            return f"Failed to {action} {model}: {e}"
+        return {"load": f"{model} loaded.", "pin": f"{model} loaded and pinned in memory.",
+                "unload": f"{model} unloaded."}[action]
@@ -0,0 +1,153 @@
+import asyncio
+import atexit
+import json
+
+class ProviderError(Exception):
+    def __init__(self, message, status=None, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = dict(headers or {})
+
+def _encode(payload):
+    # Callers that already hold the encoded body (see ContextBuilder) pass a str.
+    return payload if isinstance(payload, (str, bytes)) else json.dumps(dict(payload, stream=True))
+
+def _tool_call_text(calls):
+    """Render native tool calls as the JSON text the tool-call parser expects."""
+    rendered = []
+    for call in calls:
+        name = json.dumps(call.get("name") or "")
+        arguments = call.get("arguments")
+        if not isinstance(arguments, str):
+            arguments = json.dumps(arguments or {})
+        # Malformed argument JSON is passed through so the parser reports it to the model.
+        rendered.append('{"tool": %s, "parameters": %s}' % (name, arguments.strip() or "{}"))
+    return rendered[0] if len(rendered) == 1 else "[" + ", ".join(rendered) + "]"
+
+class StreamingTransport:
+    """Keep-alive aiohttp sessions (one per provider) that stream completions."""
+
+    def __init__(self, connect_timeout=10, read_timeout=120, pool_size=16):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self._sessions = {}
+
+    def _session(self, name):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(name)
+        if entry and entry[0] is loop and not entry[1].closed:
+            return entry[1]
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=300, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.read_timeout)
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        self._sessions[name] = (loop, session)
+        return session
+
+    async def _post(self, name, url, body, headers):
+        session = self._session(name)
+        response = await session.post(url, data=body, headers=headers)
+        if response.status >= 400:
+            text = await response.text()
+            response.release()
+            raise ProviderError(f"HTTP {response.status}: {text[:500]}", response.status, response.headers)
+        return response
+
+    async def stream_openrouter(self, url, api_key, payload, extra_headers=None, on_response=None):
+        """Yield content deltas from an OpenAI-compatible SSE stream.
+
+        ``on_response(status, headers)`` is called once the response headers arrive.
+        Streamed native ``tool_calls`` are collected and yielded as one JSON text.
+        """
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+        }
+        headers.update(extra_headers or {})
+        response = await self._post("openrouter", url, _encode(payload), headers)
+        if on_response:
+            on_response(response.status, response.headers)
+        calls = {}
+        try:
+            async for raw in response.content:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue  # blank separators and ": keep-alive" comments
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                if "error" in event:
+                    raise ProviderError(event["error"].get("message", str(event["error"])), response.status)
+                for choice in event.get("choices", []):
+                    delta = choice.get("delta", {})
+                    content = delta.get("content")
+                    if content:
+                        yield content
+                    for part in delta.get("tool_calls") or ():
+                        call = calls.setdefault(part.get("index", len(calls)), {"name": "", "arguments": ""})
+                        function = part.get("function") or {}
+                        call["name"] += function.get("name") or ""
+                        call["arguments"] += function.get("arguments") or ""
+            if calls:
+                yield _tool_call_text([calls[index] for index in sorted(calls)])
+        finally:
+            response.release()
+
+    async def stream_ollama(self, url, payload):
+        """Yield content deltas from Ollama's NDJSON chat stream."""
+        response = await self._post("ollama", url, _encode(payload), {"Content-Type": "application/json"})
+        try:
+            async for raw in response.content:
+                line = raw.strip()
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "error" in event:
+                    raise ProviderError(event["error"], response.status)
+                message = event.get("message", {})
+                if message.get("content"):
+                    yield message["content"]
+                if message.get("tool_calls"):
+                    yield _tool_call_text([call.get("function", {}) for call in message["tool_calls"]])
+                if event.get("done"):
+                    break
+        finally:
+            response.release()
+
+    async def request_json(self, name, method, url, body=None, timeout=None):
+        """A plain JSON request on the provider's session (management APIs, not completions)."""
+        import aiohttp
+
+        session = self._session(name)
+        options = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        async with session.request(method, url, json=body, **options) as response:
+            if response.status >= 400:
+                text = await response.text()
+                raise ProviderError(f"HTTP {response.status}: {text[:500]}", response.status, response.headers)
+            return await response.json(content_type=None)
+
+    async def close(self):
+        for _, session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+_transport = None
+
+def _close_transport():
+    from melius.core.runtime import get_background_loop
+
+    try:
+        get_background_loop().run(_transport.close(), timeout=5)
+    except Exception:
+        pass
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = StreamingTransport()
+        atexit.register(_close_transport)
+    return _transport
@@ -0,0 +1,186 @@
+import inspect
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+class SkillExecutionError(Exception):
+    pass
+
+def _send(conn, kind, value):
+    try:
+        conn.send((kind, value))
+    except Exception:
+        # Unpicklable results still get back to the caller, as text.
+        conn.send((kind, repr(value)))
+
+def _worker_main(conn, skills_dir, memory_limit_mb, preload):
+    if memory_limit_mb:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+    from melius.skills.registry import SkillRegistry
+
+    registry = SkillRegistry(skills_dir)
+    for name in preload:
+        try:
+            registry.get(name)
+        except Exception:
+            pass
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        name, args, kwargs = message
+        try:
+            module = registry.get(name)
+            if not hasattr(module, 'execute'):
+                _send(conn, "error", f"Skill '{name}' does not have an 'execute' function.")
+                continue
+            result = module.execute(*args, **kwargs)
+            if inspect.isgenerator(result):
+                for item in result:
+                    _send(conn, "chunk", item)
+                result = None
+            _send(conn, "done", result)
+        except MemoryError:
+            _send(conn, "error", f"Skill '{name}' exceeded the {memory_limit_mb} MB memory limit.")
+        except BaseException as e:
+            _send(conn, "error", f"{type(e).__name__}: {e}")
+
+class SkillWorker:
+    def __init__(self, context, skills_dir, memory_limit_mb, preload):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, skills_dir, memory_limit_mb, tuple(preload)),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+class SkillExecutor:
+    """Pool of pre-started worker processes that run skills out of process.
+
+    Every call gets a wall-clock ``timeout``. Each worker has an address-space
+    limit (``memory_limit_mb``, on platforms with ``resource``) and is replaced
+    after ``max_calls`` calls to contain leaks. A worker that hangs or dies is
+    killed and replaced, and the caller gets a ``SkillExecutionError``.
+    """
+
+    def __init__(self, skills_dir, workers=None, timeout=60, memory_limit_mb=1024, max_calls=100,
+                 preload=(), start_method="spawn"):
+        self.skills_dir = skills_dir
+        self.size = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_calls = max_calls
+        self.preload = preload
+        self.context = multiprocessing.get_context(start_method)
+        self.idle = queue.Queue()
+        self.closed = False
+        self._lock = threading.Lock()
+        self._workers = set()
+        for _ in range(self.size):
+            self.idle.put(self._spawn())
+
+    def _spawn(self):
+        worker = SkillWorker(self.context, self.skills_dir, self.memory_limit_mb, self.preload)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+        if not self.closed:
+            self.idle.put(self._spawn())
+
+    def _call(self, name, args, kwargs):
+        if self.closed:
+            raise SkillExecutionError("Skill executor is shut down.")
+        timeout = self.timeout
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SkillExecutionError(f"No skill worker became free within {timeout}s.")
+        deadline = time.monotonic() + timeout
+        finished = False
+        try:
+            try:
+                worker.conn.send((name, tuple(args), dict(kwargs or {})))
+            except OSError:
+                raise SkillExecutionError(f"Skill worker for '{name}' is gone; retry the call.")
+            while not finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    raise SkillExecutionError(f"Skill '{name}' timed out after {timeout}s.")
+                try:
+                    kind, value = worker.conn.recv()
+                except (EOFError, OSError):
+                    worker.process.join(timeout=1)
+                    raise SkillExecutionError(f"Skill '{name}' crashed (exit code {worker.process.exitcode}).")
+                finished = kind != "chunk"
+                if kind == "error":
+                    raise SkillExecutionError(value)
+                yield kind, value
+        finally:
+            worker.calls += 1
+            if finished and worker.calls < self.max_calls and worker.process.is_alive():
+                self.idle.put(worker)
+            else:
+                # Timed out, crashed, abandoned mid-stream or used up: replace it.
+                self._retire(worker)
+
+    def stream(self, name, args=(), kwargs=None):
+        """Run ``name`` in a worker, yielding items as a generator skill produces them.
+
+        A plain (non-generator) skill yields its single return value. Skill
+        arguments are passed as ``args``/``kwargs`` so they can't collide with
+        ours; the time limit always comes from the executor's ``timeout``.
+        """
+        for kind, value in self._call(name, args, kwargs):
+            if kind == "chunk" or value is not None:
+                yield value
+
+    def run(self, name, args=(), kwargs=None):
+        """Run a skill and return its result (a list of items for generator skills)."""
+        chunks = []
+        for kind, value in self._call(name, args, kwargs):
+            if kind == "chunk":
+                chunks.append(value)
+            elif chunks:
+                return chunks
+            else:
+                return value
+
+    def shutdown(self):
+        self.closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
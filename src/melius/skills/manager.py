@@ -1,17 +1,18 @@
 import os
-import requests
-import importlib.util
-import sys
 from rich.console import Console
 from rich.table import Table
+from melius.skills.registry import SkillRegistry
 
 console = Console()
 
 class SkillManager:
-    def __init__(self, skills_dir="~/.melius/skills"):
+    def __init__(self, skills_dir="~/.melius/skills", executor_options=None):
         self.skills_dir = os.path.expanduser(skills_dir)
+        self.executor_options = executor_options or {}
+        self._executor = None
         if not os.path.exists(self.skills_dir):
             os.makedirs(self.skills_dir)
+        self.registry = SkillRegistry(self.skills_dir)
         self.ensure_default_skills()
 
     def ensure_default_skills(self):
@@ -22,11 +23,13 @@ class SkillManager:
         """Downloads a skill file from a URL (e.g., GitHub Gist or Raw file)."""
         console.print(f"[yellow]Downloading skill '{skill_name}' from {skill_url}...[/yellow]")
         try:
+            import requests
             response = requests.get(skill_url, timeout=30)
             response.raise_for_status()
             file_path = os.path.join(self.skills_dir, f"{skill_name}.py")
             with open(file_path, 'wb') as f:
                 f.write(response.content)
+            self.registry.invalidate(skill_name)
             console.print(f"[green]Skill '{skill_name}' installed successfully.[/green]")
             return True
         except Exception as e:
@@ -34,7 +37,7 @@ class SkillManager:
             return False
 
     def list_skills(self):
-        skills = [f[:-3] for f in os.listdir(self.skills_dir) if f.endswith('.py')]
+        skills = self.registry.names()
         table = Table(title="Melius Skills")
         table.add_column("Skill Name", style="cyan")
         table.add_column("Type", style="magenta")
@@ -43,21 +46,40 @@ class SkillManager:
         console.print(table)
         return skills
 
-    def run_skill(self, skill_name, *args, **kwargs):
+    def run_skill(self, skill_name, args=(), kwargs=None):
         file_path = os.path.join(self.skills_dir, f"{skill_name}.py")
         if not os.path.exists(file_path):
             return f"Error: Skill '{skill_name}' not found."
 
-        spec = importlib.util.spec_from_file_location(skill_name, file_path)
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[skill_name] = module
-        spec.loader.exec_module(module)
-        
+        module = self.registry.get(skill_name)
         if hasattr(module, 'execute'):
-            return module.execute(*args, **kwargs)
+            return module.execute(*args, **(kwargs or {}))
         else:
             return f"Error: Skill '{skill_name}' does not have an 'execute' function."
 
+    @property
+    def executor(self):
+        """Shared out-of-process worker pool, started on first use."""
+        if self._executor is None:
+            from melius.skills.executor import SkillExecutor
+            self._executor = SkillExecutor(self.skills_dir, **self.executor_options)
+        return self._executor
+
+    def run_skill_isolated(self, skill_name, args=(), kwargs=None):
+        """Like ``run_skill`` but in a pooled worker process with time and memory limits."""
+        if not os.path.exists(os.path.join(self.skills_dir, f"{skill_name}.py")):
+            return f"Error: Skill '{skill_name}' not found."
+        from melius.skills.executor import SkillExecutionError
+        try:
+            return self.executor.run(skill_name, args, kwargs)
+        except SkillExecutionError as e:
+            return f"Error: {e}"
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def improve_agent(self, agent):
         """Self-improvement logic: analyze history and suggest optimizations."""
         console.print("[bold magenta]Initiating Self-Improvement Protocol...[/bold magenta]")
@@ -0,0 +1,105 @@
+import ast
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+
+class SkillEntry:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.stat = None
+        self.digest = None
+        self.module = None
+
+class SkillRegistry:
+    """Loads each skill module once and keeps it until its file changes.
+
+    A call only costs an ``os.stat``. When mtime or size change, the source is
+    hashed, and the module is re-executed only if the content actually differs.
+    """
+
+    def __init__(self, skills_dir):
+        self.skills_dir = skills_dir
+        self.entries = {}
+        self._names = []
+        self._dir_stat = None
+        self._lock = threading.RLock()
+
+    def path_for(self, name):
+        return os.path.join(self.skills_dir, f"{name}.py")
+
+    def names(self):
+        """Installed skill names, rescanning the directory only when it changed."""
+        st = os.stat(self.skills_dir)
+        with self._lock:
+            if self._dir_stat != (st.st_mtime_ns, st.st_ino):
+                self._names = sorted(f[:-3] for f in os.listdir(self.skills_dir) if f.endswith('.py'))
+                self._dir_stat = (st.st_mtime_ns, st.st_ino)
+                for name in list(self.entries):
+                    if name not in self._names:
+                        self._unload(name)
+            return list(self._names)
+
+    def get(self, name):
+        """Return the loaded module for ``name``, reloading it only if its source changed."""
+        path = self.path_for(name)
+        st = os.stat(path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry.stat == stat_key:
+                return entry.module
+            with open(path, 'rb') as f:
+                source = f.read()
+            digest = hashlib.sha256(source).hexdigest()
+            if entry is not None and entry.digest == digest:
+                entry.stat = stat_key
+                return entry.module
+            entry = SkillEntry(name, path)
+            entry.module = self._load(name, path, source)
+            entry.stat = stat_key
+            entry.digest = digest
+            self.entries[name] = entry
+            return entry.module
+
+    def _module_name(self, name):
+        # Namespaced so a skill called e.g. "json" can't shadow a real module.
+        return f"melius_skill_{name}"
+
+    def _load(self, name, path, source):
+        module_name = self._module_name(name)
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            exec(compile(source, path, "exec"), module.__dict__)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+        return module
+
+    def _unload(self, name):
+        self.entries.pop(name, None)
+        sys.modules.pop(self._module_name(name), None)
+
+    def invalidate(self, name=None):
+        with self._lock:
+            for skill in ([name] if name else list(self.entries)):
+                self._unload(skill)
+            self._dir_stat = None
+
+    def describe(self, name):
+        """First docstring line of a skill, read without importing it."""
+        try:
+            with open(self.path_for(name), 'r', encoding='utf-8') as f:
+                tree = ast.parse(f.read())
+        except Exception as e:
+            return f"(unreadable: {e})"
+        doc = ast.get_docstring(tree)
+        if not doc:
+            for node in tree.body:
+                if isinstance(node, ast.FunctionDef) and node.name == "execute":
+                    doc = ast.get_docstring(node)
+        return doc.strip().splitlines()[0] if doc and doc.strip() else ""
@@ -0,0 +1,28 @@
+from melius.core.agent import MeliusAgent
+from melius.core.history import CONTINUE_PROMPT
+from melius.models.provider import DEFAULT_CONFIG, ErrorText
+
+class ScriptedProvider:
+    def __init__(self, replies):
+        self.config = DEFAULT_CONFIG
+        self.replies = list(replies)
+
+    def stream_model(self, system_prompt, history, cache=None, tools=None):
+        yield self.replies.pop(0)
+
+def make_agent(tmp_path, replies):
+    (tmp_path / "main.py").write_text("print('hi')\n")
+    return MeliusAgent(str(tmp_path), provider=ScriptedProvider(replies))
+
+def test_final_answer_is_kept_in_history(tmp_path):
+    agent = make_agent(tmp_path, ['{"tool": "read_file", "parameters": {"path": "main.py"}}', "It prints hi."])
+    assert agent.run_cycle("What does main.py do?") == "It prints hi."
+    messages = list(agent.history)
+    assert messages[-2]["content"] == CONTINUE_PROMPT
+    assert messages[-1] == {"role": "assistant", "content": "It prints hi."}
+
+def test_provider_error_stays_out_of_history(tmp_path):
+    agent = make_agent(tmp_path, [ErrorText("Error querying Ollama: refused")])
+    assert agent.run_cycle("hello").startswith("Error")
+    assert agent.last_error
+    assert list(agent.history)[-1] == {"role": "user", "content": "hello"}
@@ -0,0 +1,45 @@
+from melius.core.history import CONTINUE_PROMPT, ConversationHistory
+
+def test_observations_are_capped():
+    history = ConversationHistory(max_observation_chars=200)
+    history.append({"role": "system", "content": "x" * 5000})
+    history.append({"role": "user", "content": "y" * 5000})
+    assert len(history[0]["content"]) <= 200
+    assert len(history[1]["content"]) == 5000
+
+def test_stays_under_budget_and_keeps_recent():
+    history = ConversationHistory(token_budget=3000, keep_recent=4)
+    for i in range(60):
+        history.append({"role": "user", "content": f"request {i} " + "a" * 400})
+        history.append({"role": "assistant", "content": f"answer {i} " + "b" * 400})
+    assert history.total_tokens <= 3000
+    assert [m["content"].split()[0:2] for m in history[-4:]] == [
+        ["request", "58"], ["answer", "58"], ["request", "59"], ["answer", "59"]]
+
+def test_old_messages_are_shortened_before_dropping():
+    history = ConversationHistory(token_budget=500, compact_chars=100, keep_recent=2)
+    history.append({"role": "user", "content": "read it"})
+    history.append({"role": "system", "content": "Observation: " + "z" * 4000})
+    history.append({"role": "user", "content": "now"})
+    history.append({"role": "assistant", "content": "ok"})
+    assert len(history) == 4
+    assert len(history[1]["content"]) < 200
+
+def test_summary_lists_dropped_requests_without_continue_prompts():
+    history = ConversationHistory(token_budget=300, keep_recent=2)
+    for i in range(3):
+        history.append({"role": "user", "content": f"task number {i}"})
+        history.append({"role": "assistant", "content": "c" * 600})
+        history.append({"role": "user", "content": CONTINUE_PROMPT})
+    note = history[0]
+    assert note["role"] == "system"
+    assert "task number 0" in note["content"]
+    assert CONTINUE_PROMPT not in note["content"]
+    assert sum(1 for m in history if m["content"].startswith("Earlier requests")) == 1
+
+def test_clear():
+    history = ConversationHistory(token_budget=50, keep_recent=1)
+    for i in range(5):
+        history.append({"role": "user", "content": "q" * 100})
+    history.clear()
+    assert len(history) == 0 and history.total_tokens == 0 and not history.summarized
@@ -0,0 +1,51 @@
+import time
+
+from melius.models.keys import KeyScheduler
+
+def test_spreads_concurrent_requests():
+    scheduler = KeyScheduler(["a", "b", "c"])
+    assert sorted(scheduler.acquire() for _ in range(3)) == ["a", "b", "c"]
+
+def test_prefers_key_with_most_remaining():
+    scheduler = KeyScheduler(["a", "b"])
+    scheduler.release(scheduler.acquire(exclude={"b"}), 200, {"X-RateLimit-Remaining": "3", "X-RateLimit-Reset": "60"})
+    scheduler.release(scheduler.acquire(exclude={"a"}), 200, {"X-RateLimit-Remaining": "50", "X-RateLimit-Reset": "60"})
+    assert scheduler.acquire() == "b"
+
+def test_exhausted_bucket_waits_for_reset():
+    scheduler = KeyScheduler(["a"])
+    scheduler.release(scheduler.acquire(), 200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "30"})
+    assert scheduler.acquire() is None
+    assert 29 < scheduler.next_available() <= 30
+
+def test_reset_header_in_epoch_ms():
+    scheduler = KeyScheduler(["a"])
+    reset_ms = (time.time() + 10) * 1000
+    scheduler.release(scheduler.acquire(), 200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset_ms)})
+    assert 9 < scheduler.next_available() <= 10
+
+def test_429_honours_retry_after():
+    scheduler = KeyScheduler(["a", "b"])
+    scheduler.release(scheduler.acquire(exclude={"b"}), 429, {"Retry-After": "20"})
+    assert scheduler.acquire() == "b"
+    assert scheduler.acquire(exclude={"b"}) is None
+    [state] = [s for s in scheduler.snapshot() if s["in_flight"] == 0]
+    assert 19 < state["cooldown"] <= 20
+
+def test_server_errors_back_off_exponentially():
+    scheduler = KeyScheduler(["a"], base_cooldown=5, max_cooldown=12)
+    cooldowns = []
+    for _ in range(3):
+        scheduler.states["a"].cooldown_until = 0
+        scheduler.release(scheduler.acquire(), 503)
+        cooldowns.append(scheduler.snapshot()[0]["cooldown"])
+    assert [round(c) for c in cooldowns] == [5, 10, 12]
+    scheduler.states["a"].cooldown_until = 0
+    scheduler.release(scheduler.acquire(), 200)
+    assert scheduler.states["a"].failures == 0
+
+def test_sync_adds_and_removes_keys():
+    scheduler = KeyScheduler(["a", "b"])
+    scheduler.sync(["b", "c"])
+    assert list(scheduler.states) == ["b", "c"]
+    scheduler.release("a", 200)  # a key removed mid-request is ignored
@@ -0,0 +1,30 @@
+from melius.gateway.output import split_message
+
+def test_short_text_is_one_message():
+    assert split_message("hello") == ["hello"]
+    assert split_message("   \n") == []
+
+def test_every_chunk_fits():
+    text = "\n".join(f"line {i} " + "x" * (i % 50) for i in range(2000))
+    chunks = split_message(text, limit=500)
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+def test_prefers_blank_lines():
+    paragraphs = ["para %d\n" % i + "word " * 30 for i in range(10)]
+    chunks = split_message("\n\n".join(paragraphs), limit=400)
+    assert all(chunk.startswith("para ") for chunk in chunks)
+
+def test_long_line_is_cut():
+    chunks = split_message("a" * 1000, limit=300)
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks) == "a" * 1000
+
+def test_code_block_is_closed_and_reopened():
+    code = "\n".join(f"print({i})" for i in range(200))
+    chunks = split_message(f"Here:\n```python\n{code}\n```\nDone.", limit=400)
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk) <= 400
+        assert chunk.count("```") % 2 == 0, chunk
+    assert all(chunk.startswith("```python") for chunk in chunks[1:-1])
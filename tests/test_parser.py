@@ -0,0 +1,74 @@
+from melius.core.parser import ToolCallParser, parse_tool_calls
+
+def feed_all(chunks):
+    parser = ToolCallParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    parser.close()
+    return parser
+
+def test_call_after_prose():
+    calls, errors = parse_tool_calls('Let me look.\n{"tool": "read_file", "parameters": {"path": "a.py"}}')
+    assert calls == [{"tool": "read_file", "parameters": {"path": "a.py"}}]
+    assert errors == []
+
+def test_braces_in_prose_are_skipped():
+    text = 'Use a dict like {a: 1} or set {1, 2} or [x] then:\n{"tool": "list_files", "parameters": {}}'
+    calls, errors = parse_tool_calls(text)
+    assert calls == [{"tool": "list_files", "parameters": {}}]
+    assert errors == []
+
+def test_json_without_tool_is_ignored():
+    calls, errors = parse_tool_calls('Config: {"debug": true}. Nothing to do.')
+    assert calls == []
+    assert errors == []
+
+def test_parallel_batch():
+    text = '[{"tool": "read_file", "parameters": {"path": "a"}}, {"tool": "read_file", "parameters": {"path": "b"}}]'
+    calls, _ = parse_tool_calls(text)
+    assert [call["parameters"]["path"] for call in calls] == ["a", "b"]
+
+def test_stops_at_first_block():
+    parser = ToolCallParser()
+    found = parser.feed('{"tool": "a", "parameters": {}} {"tool": "b", "parameters": {}}')
+    assert [call["tool"] for call in found] == ["a"]
+    assert parser.done
+
+def test_chunks_split_anywhere():
+    text = 'Sure. {"tool": "write_file", "parameters": {"path": "x.py", "content": "s = \\"}{[\\"\\n"}} trailing'
+    expected, _ = parse_tool_calls(text)
+    assert expected[0]["parameters"]["content"] == 's = "}{["\n'
+    for size in (1, 2, 3, 7):
+        parser = feed_all([text[i:i + size] for i in range(0, len(text), size)])
+        assert parser.calls == expected, size
+
+def test_escaped_quote_split_across_chunks():
+    parser = feed_all(['{"tool": "run", "parameters": {"cmd": "echo \\', '"}"}}'])
+    assert parser.calls == [{"tool": "run", "parameters": {"cmd": 'echo "}'}}]
+
+def test_offset_tracks_stream_position():
+    parser = feed_all(["abc ", '{"tool": ', '"x", "parameters": {]}'])
+    assert parser.calls == []
+    [error] = parser.errors
+    assert error.message == "Mismatched ']'"
+    assert error.offset == len('abc {"tool": "x", "parameters": {]')
+
+def test_invalid_json_is_reported():
+    calls, errors = parse_tool_calls('{"tool": "read_file", "parameters": {"path": a.py}}')
+    assert calls == []
+    [error] = errors
+    assert error.offset == len('{"tool": "read_file", "parameters": {"path": ')
+    assert "a.py" in error.snippet
+    assert error.to_dict()["error"] == error.message
+
+def test_unterminated_block_is_reported_on_close():
+    calls, errors = parse_tool_calls('{"tool": "read_file", "parameters": {"path": "a.py"')
+    assert calls == []
+    assert [error.message for error in errors] == ["Unterminated JSON block"]
+
+def test_unterminated_prose_brace_is_not_an_error():
+    calls, errors = parse_tool_calls('The closing {"brace is missing')
+    assert calls == []
+    assert errors == []
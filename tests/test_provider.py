@@ -0,0 +1,55 @@
+import asyncio
+
+import melius.models.transport as transport
+from melius.models.provider import ModelProvider
+
+class FakeTransport:
+    def __init__(self, chunks, headers):
+        self.chunks = chunks
+        self.headers = headers
+
+    async def stream_openrouter(self, url, api_key, payload, extra_headers=None, on_response=None):
+        on_response(200, self.headers)
+        for chunk in self.chunks:
+            yield chunk
+
+def make_provider(tmp_path, **config):
+    provider = ModelProvider(str(tmp_path / "config.json"))
+    provider.config.update(active_provider="openrouter", openrouter_keys=["k1-secret", "k2-secret"], **config)
+    provider.key_scheduler.sync(provider.config["openrouter_keys"])
+    return provider
+
+def test_closing_stream_early_releases_key(tmp_path, monkeypatch):
+    fake = FakeTransport(['{"tool": "read_file"}', " more", " text"],
+                         {"X-RateLimit-Remaining": "41", "X-RateLimit-Reset": "60"})
+    monkeypatch.setattr(transport, "_transport", fake)
+    provider = make_provider(tmp_path)
+
+    async def first_chunk():
+        stream = provider.stream_openrouter("system", [{"role": "user", "content": "hi"}])
+        chunk = await stream.__anext__()
+        await stream.aclose()
+        return chunk
+
+    assert asyncio.run(first_chunk()) == '{"tool": "read_file"}'
+    states = provider.key_scheduler.states.values()
+    assert [s.in_flight for s in states] == [0, 0]
+    assert sorted(s.remaining for s in states if s.remaining is not None) == [41]
+
+def test_full_stream_releases_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(transport, "_transport", FakeTransport(["a", "b"], {"X-RateLimit-Remaining": "7"}))
+    provider = make_provider(tmp_path)
+
+    async def collect():
+        return [chunk async for chunk in provider.stream_openrouter("system", [{"role": "user", "content": "hi"}])]
+
+    assert asyncio.run(collect()) == ["a", "b"]
+    assert all(s.in_flight == 0 for s in provider.key_scheduler.states.values())
+
+def test_partial_config_section_keeps_defaults(tmp_path):
+    (tmp_path / "config.json").write_text('{"context": {"native_tools": true}, "ollama": {"pin": true}}')
+    provider = ModelProvider(str(tmp_path / "config.json"))
+    assert provider.config["context"]["native_tools"] is True
+    assert provider.config["ollama"]["pin"] is True
+    body = provider.request_body("openai/gpt-4o", "system", [{"role": "user", "content": "hi"}])
+    assert body
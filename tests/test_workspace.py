@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from melius.core.workspace import WorkspaceIndex
+
+def make_tree(root, dirs=10, files=3):
+    for d in range(dirs):
+        os.makedirs(root / f"pkg{d}" / "sub")
+        for f in range(files):
+            (root / f"pkg{d}" / f"m{f}.py").write_text(f"x = {f}\n")
+            (root / f"pkg{d}" / "sub" / f"s{f}.py").write_text(f"y = {f}\n")
+    age(root)
+
+def age(root):
+    # Listings of freshly modified directories aren't trusted; pretend the tree is old.
+    past = 1_600_000_000
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (past, past))
+
+def count_scandir(monkeypatch):
+    calls = []
+    scandir = os.scandir
+
+    def counting(path):
+        calls.append(os.path.basename(os.path.normpath(path)))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting)
+    return calls
+
+def test_new_file_relists_only_its_directory(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    workspace = WorkspaceIndex(str(tmp_path))
+    workspace.refresh(force=True)
+    calls = count_scandir(monkeypatch)
+
+    (tmp_path / "new.py").write_text("z = 1\n")
+    added, modified, removed = workspace.refresh(force=True)
+    assert (added, modified, removed) == (["new.py"], [], [])
+    assert len(calls) == 1
+
+    calls.clear()
+    (tmp_path / "pkg3" / "m0.py").write_text("x = 'changed'\n")
+    assert workspace.refresh(force=True) == ([], ["pkg3/m0.py"], [])
+    assert calls == [tmp_path.name]  # the root is still too fresh to trust
+
+def test_gitignore_change_relists_its_subtree(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    (tmp_path / "pkg2" / ".gitignore").write_text("*.log\n")
+    age(tmp_path)
+    workspace = WorkspaceIndex(str(tmp_path))
+    workspace.refresh(force=True)
+    assert "pkg2/sub/s1.py" in workspace.entries
+
+    gitignore = tmp_path / "pkg2" / ".gitignore"
+    gitignore.write_text("sub/\n")
+    stat = os.stat(gitignore)
+    os.utime(gitignore, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    age(tmp_path)
+    calls = count_scandir(monkeypatch)
+    added, modified, removed = workspace.refresh(force=True)
+    assert sorted(removed) == ["pkg2/sub/s0.py", "pkg2/sub/s1.py", "pkg2/sub/s2.py"]
+    assert calls == ["pkg2"]
+
+def test_removed_directory_drops_its_files(tmp_path):
+    make_tree(tmp_path, dirs=2)
+    workspace = WorkspaceIndex(str(tmp_path))
+    workspace.refresh(force=True)
+    for name in os.listdir(tmp_path / "pkg1" / "sub"):
+        os.remove(tmp_path / "pkg1" / "sub" / name)
+    os.rmdir(tmp_path / "pkg1" / "sub")
+    added, modified, removed = workspace.refresh(force=True)
+    assert sorted(removed) == ["pkg1/sub/s0.py", "pkg1/sub/s1.py", "pkg1/sub/s2.py"]
+    assert not any(rel.startswith("pkg1/sub/") for rel in workspace.entries)
+
+def test_read_lines(tmp_path):
+    (tmp_path / "a.txt").write_text("one\ntwo\nthree\n")
+    (tmp_path / "b.txt").write_text("no newline")
+    (tmp_path / "empty.txt").write_text("")
+    workspace = WorkspaceIndex(str(tmp_path))
+    assert workspace.read_lines("a.txt", 2, 3) == ("two\nthree\n", 3)
+    assert workspace.read_lines("a.txt", 3) == ("three\n", 3)
+    assert workspace.read_lines("a.txt", 2, 99) == ("two\nthree\n", 3)
+    assert workspace.read_lines("a.txt", 5) == ("", 3)
+    assert workspace.read_lines("b.txt") == ("no newline", 1)
+    assert workspace.read_lines("empty.txt") == ("", 0)
+
+def test_read_lines_sees_rewrites(tmp_path):
+    workspace = WorkspaceIndex(str(tmp_path))
+    workspace.write("a.txt", "one\ntwo\n")
+    assert workspace.read_lines("a.txt", 2) == ("two\n", 2)
+    workspace.write("a.txt", "first line is longer now\nsecond\nthird\n")
+    assert workspace.read_lines("a.txt", 2, 2) == ("second\n", 3)
+
+def test_edit(tmp_path):
+    workspace = WorkspaceIndex(str(tmp_path))
+    workspace.write("a.py", "x = 1\ny = 2\nx = 1\n")
+    with pytest.raises(ValueError, match="matches 2 times"):
+        workspace.edit("a.py", "x = 1", "x = 3")
+    with pytest.raises(ValueError, match="not found"):
+        workspace.edit("a.py", "z = 1", "z = 3")
+    with pytest.raises(ValueError, match="between 1 and 2"):
+        workspace.edit("a.py", "x = 1", "x = 3", occurrence=3)
+    assert workspace.edit("a.py", "x = 1", "x = 3", occurrence=2) == 3
+    assert workspace.read("a.py") == "x = 1\ny = 2\nx = 3\n"
+    assert workspace.edit("a.py", "y = 2\n", "") == 2
+    assert workspace.read("a.py") == "x = 1\nx = 3\n"
+
+def test_paths_outside_the_workspace_are_refused(tmp_path):
+    workspace = WorkspaceIndex(str(tmp_path / "ws"))
+    os.makedirs(tmp_path / "ws")
+    (tmp_path / "secret.txt").write_text("s")
+    with pytest.raises(ValueError):
+        workspace.read("../secret.txt")